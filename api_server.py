@@ -1,7 +1,7 @@
 # main.py
 from __future__ import annotations
 
-from typing import Optional, List, Union, Literal, Any, Dict
+from typing import Optional, List, Union, Literal, Any, Dict, Set
 from datetime import datetime, time
 from enum import Enum
 import uuid
@@ -12,13 +12,46 @@ import uvicorn
 # Custom error handling for fastapi Body. This error due to pydantic and fastapi version that checs inoput before json serializing
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from http import HTTPStatus
 from fastapi import Request
 
-from modules.test_report import TestReport
-from modules.test_result import TestCase, TestGroup
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import os
+import shutil
+
+from test_management_exposure.modules.test_report import TestReport
+from test_management_exposure.modules.test_result import ResultType, TestStatus
+from test_management_exposure.modules.test_metadata import TestType
+from test_management_exposure.modules.report_store import ReportStore
+from test_management_exposure.modules.content_hash import ReportDigest, raw_digest
+from test_management_exposure.modules.config_index import ConfigurationIndex, QueryError
+from test_management_exposure.modules.result_index import ResultIndex, StaleCursor
+from test_management_exposure.modules.expectation_eval import ExpectationEngine, ReportEvaluation
+from test_management_exposure.modules.executor import (
+    ExecutionStrategy, ExecutorSaturated, ReportValidationFailed, digest_report, parse_report, parse_test_results, serialize_response,
+)
+from test_management_exposure.modules.write_coalescer import WriteCoalescer
+from test_management_exposure.modules.streaming_ingest import (
+    INGEST_MAX_BODY_BYTES, INGEST_STREAM_MIN_BYTES, BodyTooLarge, IngestError, ingest_report,
+)
+from test_management_exposure.modules.snapshot import (
+    MEASUREMENTS_FILE, REPORTS_FILE, SNAPSHOT_MAX_UPLOAD_BYTES, SnapshotError, SnapshotUnavailable,
+    extract_reports_file, make_spool_dir, read_snapshot, stream_tar, write_snapshot,
+)
+from test_management_exposure.modules.retention import RetentionScheduler, strip_measurements
+from test_management_exposure.modules.tabular_export import (
+    DEFAULT_PARAMETERS, ExportUnavailable, column_names, iter_rows, parameter_fields, stream_csv, stream_parquet, utc_datetime,
+)
+from test_management_exposure.modules.compression import RequestDecompression
+from test_management_exposure.modules.admission import AdmissionController, AdmissionMiddleware
+from test_management_exposure.modules.profiling import ProfileCaptureRequest, ProfilingMiddleware, profiler
+from test_management_exposure.modules.results_archive import (
+    ARCHIVE_MAX_BYTES, ArchiveError, ArchiveMemberResponse, archive_index,
+    archive_file_path, discard_archive, index_archive, new_upload_path, parse_range, prune_orphan_archives, referenced_artifact_paths,
+)
 def convert_validation_errors(validation_error: ValidationError | RequestValidationError) -> list[dict[str, Any]]:
     converted_errors = []
     for error in validation_error.errors():
@@ -57,13 +90,112 @@ class ClassName(str, Enum):
     Test_REPORT = "TestReport"
     Test = "Test"
 
-# Mock database
-test_report_db: Dict[str, TestReport] = {}
+# Report storage: in memory, spilling least recently used reports to disk past the memory budget
+test_report_db: ReportStore = ReportStore()
+# Bitmap index of configuration parameters, kept in step with test_report_db
+config_index = ConfigurationIndex()
+# Server-side evaluation of expectation targets against recorded measurements
+expectation_engine = ExpectationEngine(test_report_db.version)
+# Where CPU-bound validation/serialization runs: inline, thread pool or process pool by body size
+execution_strategy = ExecutionStrategy()
+
+# Content hash of each report as last PUT, to recognize unchanged re-uploads
+report_digests: Dict[str, ReportDigest] = {}
+
+# Test case/group lookups and paginated testResults, with cached JSON fragments
+result_index = ResultIndex(test_report_db)
+
+
+def apply_test_results_patches(id: str, patches: List[list]) -> int:
+    """
+    Applies a burst of validated testResults patches to a stored report as
+    one update and returns the new report version. Each PATCH replaces
+    testResults, so the last one of the burst wins.
+    """
+    if id not in test_report_db:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Resource '{id}' not found.")
+    patched_test_results = patches[-1]
+    # Update the testResults in the existing report
+    updated_report = test_report_db[id].model_copy(update={"testResults": patched_test_results})
+    # The PATCH route spills whatever this pushes out of the hot tier, off the event loop
+    test_report_db.put(id, updated_report, evict=False) # Update in the database (in-memory here)
+    report_digests.pop(id, None)
+    retention_scheduler.track(id, updated_report)
+    # Only the test cases carried by the patch need evaluating
+    expectation_engine.evaluate(id, updated_report, test_report_db.version(id), cases=patched_test_results)
+    if len(patches) > 1:
+        print(f"Test Report '{id}' updated with {len(patches)} coalesced PATCH requests.")
+    return test_report_db.version(id)
+
+def update_report_indexes(id: str, report: TestReport, changed: Optional[set] = None) -> None:
+    """Re-indexes a stored report for the top-level members in `changed`, or for all of them."""
+    if changed is None or changed & {"testMetadata", "testbedComponents"}:
+        config_index.add(id, report)
+    if changed is None or changed & {"testMetadata", "tags", "testResults"}:
+        # New test results may carry measurement arrays to strip again
+        retention_scheduler.track(id, report)
+
+
+def remove_report(id: str) -> None:
+    """Deletes a stored report along with its index entries, evaluation and results archive."""
+    patch_coalescer.flush(id)
+    del test_report_db[id]
+    config_index.remove(id)
+    expectation_engine.forget(id)
+    result_index.forget(id)
+    report_digests.pop(id, None)
+    retention_scheduler.untrack(id)
+    discard_archive(id)
+
+
+async def strip_report(id: str) -> bool:
+    """Reduces the measurement arrays of a stored report to summaries, leaving it in its current tier.
+
+    The work runs in the threadpool. Returns False when the report is gone
+    or was written meanwhile, in which case a later pass tries again.
+    """
+    patch_coalescer.flush(id)
+    if id not in test_report_db:
+        return False
+    version = test_report_db.version(id)
+    try:
+        stored = await run_in_threadpool(strip_stored_report, id, version)
+    except KeyError:
+        return False  # deleted meanwhile
+    if stored:
+        report_digests.pop(id, None)
+        print(f"Test Report '{id}' measurements compacted by retention policy.")
+    return stored
+
+
+def strip_stored_report(id: str, version: int) -> bool:
+    return test_report_db.put(id, strip_measurements(test_report_db.peek(id)), promote=False, if_version=version)
+
+
+def compact_storage() -> int:
+    return test_report_db.compact() + prune_orphan_archives()
+
+# Background retention (RETENTION_POLICIES): deletes expired reports and strips measurement arrays
+retention_scheduler = RetentionScheduler(
+    delete=remove_report, strip=strip_report, compact=compact_storage,
+)
+
+# Opt-in (PATCH_COALESCE_WINDOW_MS) merging of PATCH bursts to the same report.
+# Readers flush a report's pending burst first, so they always see prior writes.
+patch_coalescer = WriteCoalescer(apply_test_results_patches)
 # test_spec_db: Dict[str, TestSpecification] = {} # Storage for reports
 # test_result_db: Dict[str, TestResults] = {} # Storage for reports
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    retention_scheduler.start()
+    yield
+    await retention_scheduler.stop()
+    execution_strategy.shutdown()
+
 # --- FastAPI App ---
 app = FastAPI(
+    lifespan=lifespan,
     title="Test NRM ProvMnS API",
     version="1.0.0",
     description="Simple API to demonstrate Test creation via PUT",
@@ -83,25 +215,109 @@ app = FastAPI(
     }
 )
 
+# gzip/deflate request bodies (Content-Encoding) on the resource routes
+app.add_middleware(RequestDecompression, max_bytes=INGEST_MAX_BODY_BYTES, path_prefix="/ProvMnS/v1alpha1/SubNetwork")
+
+async def run_off_loop(size: int, fn, *args, allow_process: bool = True):
+    """Runs a validation/serialization job through execution_strategy, mapping its failures to HTTP errors."""
+    try:
+        return await execution_strategy.run(size, fn, *args, allow_process=allow_process)
+    except ReportValidationFailed as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=[{"type": e["type"], "loc": ["body", *e["loc"]], "msg": e["msg"]} for e in exc.errors],
+        )
+    except ExecutorSaturated as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc), headers={"Retry-After": "1"})
+
+# Requests selected by an armed capture (or the X-Profile header) run under the profiler
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Per route class and per client limits in front of the resource router
+admission = AdmissionController(bulk_prefixes=["/ProvMnS/v1alpha1/SubNetwork/exports/"])
+app.add_middleware(AdmissionMiddleware, controller=admission, path_prefix="/ProvMnS/v1alpha1/SubNetwork")
+
 router =  APIRouter(prefix="/ProvMnS/v1alpha1/SubNetwork")
 
+admin_router = APIRouter(prefix="/admin")
+
 RESOURCE_TAG = "Unified Resources (Test/TestReport)"
+ADMIN_TAG = "Administration"
+
+def check_report_id(body: TestReport, id: str) -> str:
+    """Returns the testId of a PUT body after checking it matches the path id."""
+    test_meta_id=body.testMetadata.testId
+    if test_meta_id is None:
+        print(f"Test Metadata ID is None. Cannot proceed.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Test Metadata ID is None.")
+        
+    if test_meta_id !=id:
+        print(f"Test Metadata ID '{test_meta_id}' does not match the provided ID '{id}'.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Test Metadata ID '{test_meta_id}' does not match the provided ID '{id}'.")
+    # TestMetadata.configurationParameters
+    print(f"Received Test Metadata (ID: {test_meta_id}):")
+    return test_meta_id
+
+
+async def create_streamed_report(request: Request, id: str) -> Response:
+    """PUT path for large or chunked bodies: validates testResults item by item
+    as the body arrives and writes the report straight to the store's cold tier."""
+    writer = test_report_db.open_cold_writer(id)
+    try:
+        ingested = await ingest_report(request.stream(), writer, run_off_loop, expectation_engine)
+        test_meta_id = check_report_id(ingested.envelope, id)
+        previous = report_digests.get(test_meta_id) if test_meta_id in test_report_db else None
+        if previous is not None and previous == ingested.digest:
+            print(f"Test Report '{test_meta_id}' unchanged. Skip it.")
+            test_report_db.discard_cold_writer(writer)
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except IngestError as exc:
+        test_report_db.discard_cold_writer(writer)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=[{"type": "json_invalid", "loc": ["body"], "msg": str(exc)}],
+        )
+    except BodyTooLarge as exc:
+        test_report_db.discard_cold_writer(writer)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
+    except BaseException:
+        test_report_db.discard_cold_writer(writer)
+        raise
+
+    replacing = test_meta_id in test_report_db
+    test_report_db.commit_cold(test_meta_id, writer)
+    update_report_indexes(test_meta_id, ingested.envelope, previous.changed_members(ingested.digest) if previous else None)
+    if ingested.evaluations is not None:
+        expectation_engine.record(test_meta_id, ingested.evaluations, test_report_db.version(test_meta_id))
+    else:
+        expectation_engine.forget(test_meta_id)
+    report_digests[test_meta_id] = ingested.digest
+    print(f"Test Report '{test_meta_id}' streamed to storage ({ingested.size} bytes).")
+    return Response(status_code=status.HTTP_200_OK if replacing else status.HTTP_201_CREATED)
 
 @router.put(
     "/{id}",
     # response_model=TestRequestBody, # Return the same structure as received
     responses={
-        # 200: {"description": "Resource updated successfully"},
+        200: {"description": "Resource replaced"},
         201: {"description": "Resource created successfully"},
-        204: {"description": "Resource updated with no changes"}
+        204: {"description": "Resource updated with no changes (same content as stored)"},
+        413: {"description": "Body exceeds INGEST_MAX_BODY_BYTES"},
     },
     summary="Create or Update an Test",
-    tags=["Test Management"]
+    tags=["Test Management"],
+    # The body is read raw and validated off the event loop; document it as a TestReport
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/TestReport"}}},
+        }
+    },
 )
 
 async def create_or_replace_Test( # Renamed for clarity (PUT replaces)
+    request: Request,
     id: str = Path(..., description="The unique identifier of the subnetwork or related entity."),
-    body: TestReport = Body(...),
     response: Response = Response(status_code=status.HTTP_201_CREATED)
 ):
     """
@@ -116,32 +332,166 @@ async def create_or_replace_Test( # Renamed for clarity (PUT replaces)
     (overwriting if the Test ID already exists), and returns the stored Test data.
     """
     print(f"Received PUT request for id={id}")
-    
-    test_meta_id=body.testMetadata.testId
-    if test_meta_id is None:
-        print(f"Test Metadata ID is None. Cannot proceed.")
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Test Metadata ID is None.")
-        
-    if test_meta_id !=id:
-        print(f"Test Metadata ID '{test_meta_id}' does not match the provided ID '{id}'.")
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Test Metadata ID '{test_meta_id}' does not match the provided ID '{id}'.")
-    # TestMetadata.configurationParameters
-    print(f"Received Test Metadata (ID: {test_meta_id}):")
-    if test_report_db.get(test_meta_id) is not None:
-        print(f"Test Metadata ID'{test_meta_id}' already exists in memory. Skip it.")
+    # Pending PATCHes apply to the report being replaced, not to this body
+    patch_coalescer.flush(id)
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > INGEST_MAX_BODY_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Body exceeds {INGEST_MAX_BODY_BYTES} bytes.")
+    if content_length is None or not content_length.isdigit() or int(content_length) >= INGEST_STREAM_MIN_BYTES:
+        return await create_streamed_report(request, id)
+    raw_body = await request.body()
+    # Re-uploads of the stored content are settled by hash, before any validation.
+    # `previous` describes version `base` of the report; a write landing while
+    # this body is digested or parsed makes both stale.
+    base = test_report_db.version(id)
+    previous = report_digests.get(id) if id in test_report_db else None
+    if previous is not None and previous.raw == raw_digest(raw_body):
+        print(f"Test Report '{id}' unchanged. Skip it.")
         return Response(status_code=status.HTTP_204_NO_CONTENT)
+    digest: Optional[ReportDigest] = await run_off_loop(len(raw_body), digest_report, raw_body)
+    if previous is not None and previous == digest and test_report_db.version(id) == base:
+        print(f"Test Report '{id}' unchanged. Skip it.")
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    body: TestReport = await run_off_loop(len(raw_body), parse_report, raw_body)
+
+    test_meta_id = check_report_id(body, id)
+    while True:
+        current = test_report_db.version(test_meta_id)
+        # Written meanwhile: replace the report whole, without reusing its items or indexes
+        previous = report_digests.get(test_meta_id) if previous is not None and current == base else None
+        base = current
+        replacing = test_meta_id in test_report_db
+        changed = previous.changed_members(digest) if previous is not None and digest is not None else None
+        stored_body = body
+        if changed is not None and previous.items is not None and digest.items is not None and test_report_db.is_hot(test_meta_id):
+            # Keep the stored objects of unchanged test results, and with them their cached fragments
+            stored = test_report_db.peek(test_meta_id).testResults or []
+            if "testResults" not in changed:
+                stored_body = body.model_copy(update={"testResults": stored})
+            elif len(stored) == len(previous.items):
+                kept = dict(zip(previous.items, stored))
+                stored_body = body.model_copy(update={"testResults": [kept.get(d, item) for d, item in zip(digest.items, body.testResults)]})
+        # Compared with the version `previous` describes, e.g. against a retention pass in the threadpool
+        if await test_report_db.aput(test_meta_id, stored_body, size=len(raw_body), if_version=base):
+            body = stored_body
+            break
+    update_report_indexes(test_meta_id, body, changed)
+    version = test_report_db.version(test_meta_id)
+    if changed is None or "testSpecifications" in changed or previous.items is None or digest.items is None:
+        expectation_engine.evaluate(test_meta_id, body, version)
+    elif "testResults" in changed:
+        # Only the test results not stored before need evaluating
+        expectation_engine.evaluate(test_meta_id, body, version, cases=[body.testResults[i] for i in previous.changed_items(digest)])
+    else:
+        # Same test results and specifications: carry the results over to this version
+        expectation_engine.evaluate(test_meta_id, body, version, cases=[])
+    if digest is not None:
+        report_digests[test_meta_id] = digest
 
-        Test_to_store = body.Test
-        # DEBUG
-        # Test_to_store.TestReportReference = Test_id
+    print(f"Test Report '{test_meta_id}' {'replaced' if replacing else 'stored'}.")
+    return Response(status_code=status.HTTP_200_OK if replacing else status.HTTP_201_CREATED)
 
-        # Test_to_store.TestReportReference = str(uuid.uuid4())
-        # Test_report_id = Test_to_store.TestReportReference
-    
-    test_report_db[test_meta_id] = body
+@router.get(
+    "",
+    summary="Find Test Reports by configuration parameters",
+    tags=["Test Management"],
+    responses={
+        200: {"description": "Ids of the matching test reports"},
+        400: {"description": "Malformed query"},
+    },
+)
+async def query_test_reports(request: Request):
+    """
+    Finds test reports by the `ConfigurationParameters` of their test
+    metadata and testbed components, including vendor-specific keys.
+
+    Every query parameter is a field name, e.g.
+    `?band5G=n78&frequencyRange5G=fr1&duplexMode=tdd&numMimoLayers=ge:4&totalTransmissionBandwidth=100`.
+    Repeated parameters are OR-ed, different parameters are AND-ed. Numeric
+    values accept `ge:`, `gt:`, `le:`, `lt:` and `eq:` prefixes and any
+    value can be negated with `not:`.
+    """
+    try:
+        ids = config_index.query(list(request.query_params.multi_items()))
+    except QueryError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return {"count": len(ids), "testIds": ids}
+
+# Query parameters of the export that are not configuration criteria
+_EXPORT_PARAMS = {"format", "dutName", "testType", "result", "startFrom", "startTo", "parameters", "includeValues"}
+
+@router.get(
+    "/exports/measurements",
+    summary="Export measurements and verdicts of many Test Reports as CSV or Parquet",
+    tags=["Test Management"],
+    responses={
+        200: {"description": "One row per measurement", "content": {"text/csv": {}, "application/vnd.apache.parquet": {}}},
+        400: {"description": "Malformed query"},
+        501: {"description": "Parquet requested but pyarrow is not installed"},
+    },
+)
+async def export_measurements(
+    request: Request,
+    format: Literal["csv", "parquet"] = Query("csv", description="Output format."),
+    dutName: Optional[str] = Query(None, description="Only reports of this device under test."),
+    testType: Optional[TestType] = Query(None, description="Only reports of this test type."),
+    result: Optional[ResultType] = Query(None, description="Only reports with this overall result."),
+    startFrom: Optional[datetime] = Query(None, description="Only reports started at or after this time."),
+    startTo: Optional[datetime] = Query(None, description="Only reports started before this time."),
+    parameters: Optional[str] = Query(None, description="Comma-separated ConfigurationParameters fields exported as columns."),
+    includeValues: bool = Query(False, description="Add the measurement values as a JSON array column."),
+):
+    """
+    Flattens the results of every matching report into one row per test
+    case, metric and measurement, with the report's dutName, dates, testType
+    and result and the selected configuration parameters as columns.
+    Measurements recorded on a test case outside its metrics get an empty
+    `metric`. Verdicts are the results as reported. Measurements compacted by
+    a retention policy are marked `compacted`; their count, min, max and mean
+    are those of the values they had before.
+
+    Every other query parameter selects reports by configuration parameters,
+    as for the report query, e.g. `?format=parquet&band5G=n78&numMimoLayers=ge:4`.
+    Rows are streamed as they are produced, in CSV chunks or Parquet row
+    groups, so exports of any size use constant memory.
+    """
+    patch_coalescer.flush_all()
+    criteria = [(k, v) for k, v in request.query_params.multi_items() if k not in _EXPORT_PARAMS]
+    try:
+        ids = config_index.query(criteria)
+    except QueryError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    # Selected on the indexed metadata, so only matching reports are ever decoded
+    ids = config_index.select(ids, dutName, testType, result, utc_datetime(startFrom), utc_datetime(startTo))
+
+    def matching_reports():
+        # Runs in the threadpool as the response streams, one report at a time
+        for report_id in ids:
+            try:
+                yield report_id, test_report_db.peek(report_id)
+            except KeyError:
+                continue  # deleted meanwhile
 
-    print(f"Test Report '{test_meta_id}' stored/replaced.")
-    return Response(status_code=status.HTTP_201_CREATED)
+    try:
+        fields = parameter_fields(parameters.split(",")) if parameters is not None else DEFAULT_PARAMETERS
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    columns = column_names(fields)
+    rows = iter_rows(matching_reports(), fields, includeValues)
+    if format == "parquet":
+        try:
+            chunks = stream_parquet(rows, columns)
+        except ExportUnavailable as exc:
+            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(exc))
+        media_type = "application/vnd.apache.parquet"
+    else:
+        chunks, media_type = stream_csv(rows, columns), "text/csv"
+    print(f"Exporting measurements of up to {len(ids)} Test Report(s) as {format}.")
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="measurements.{format}"'},
+    )
 
 @router.get(
     "/{id}",
@@ -165,12 +515,18 @@ async def get_test_report(
     - **id**: ID of the parent resource.
     """
     print(f"Received GET request for  id={id}")
+    patch_coalescer.flush(id)
 
-    if id in test_report_db:
+    try:
+        # A cold report is rehydrated in the threadpool
+        report = await test_report_db.aget(id) if id in test_report_db else None
+    except KeyError:
+        report = None  # deleted meanwhile
+    if report is not None:
         print(f"Test Report '{id}' found in memory.")
-        response.status_code = status.HTTP_200_OK
-        # Validate the response through the Pydantic model to apply response_model_exclude_none
-        return TestReport.model_validate(test_report_db[id])
+        # Serialize as response_model_exclude_none would, off the event loop for large reports
+        content = await run_off_loop(test_report_db.size_of(id), serialize_response, report, allow_process=False)
+        return Response(content=content, media_type="application/json")
     else:
         print(f"Test '{id}' not found in memory.")
         # response.status_code = status.HTTP_404_NOT_FOUND
@@ -178,6 +534,70 @@ async def get_test_report(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
     
     
+# --- testResults sub-resources ---
+@router.get(
+    "/{id}/testResults",
+    summary="List the test cases of a Test Report",
+    tags=["Test Management"],
+    responses={
+        200: {"description": "One page of test cases, in document order"},
+        404: {"description": "Test report not found"},
+        409: {"description": "Cursor is malformed or the report changed since it was issued"},
+    },
+)
+async def list_test_results(
+    id: str = Path(..., description="The unique identifier of the Test Report."),
+    cursor: Optional[str] = Query(None, description="`nextCursor` of the previous page."),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of test cases returned."),
+    status_filter: Optional[TestStatus] = Query(None, alias="status", description="Only test cases with this status."),
+    result: Optional[ResultType] = Query(None, description="Only test cases with this result."),
+):
+    """
+    Returns test cases in document order, descending through test groups,
+    as `{"items": [...], "total": n, "nextCursor": ...}`. `total` counts
+    the test cases matching the filters; `nextCursor` is null on the last page.
+    """
+    patch_coalescer.flush(id)
+    if id not in test_report_db:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    try:
+        fragments, total, next_cursor = await result_index.page(id, limit, cursor, status_filter, result)
+    except StaleCursor as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    # Cached fragments are spliced in as they are, without re-serializing
+    content = b'{"items":[' + b",".join(fragments) + b'],"total":' + str(total).encode() + b',"nextCursor":' + (
+        f'"{next_cursor}"'.encode() if next_cursor else b"null"
+    ) + b"}"
+    return Response(content=content, media_type="application/json")
+
+
+@router.get(
+    "/{id}/testResults/{number}",
+    summary="Retrieve a test case or test group of a Test Report",
+    tags=["Test Management"],
+    responses={
+        200: {"description": "The test case or test group, groups with all their items"},
+        404: {"description": "Test report or test case not found"},
+    },
+)
+async def get_test_result(
+    id: str = Path(..., description="The unique identifier of the Test Report."),
+    number: str = Path(..., description="Number of the test case or group, e.g. `1.2.3`, at any nesting depth."),
+):
+    patch_coalescer.flush(id)
+    if id not in test_report_db:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    try:
+        fragment = await result_index.fragment(id, number)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    if fragment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Test case '{number}' not found in TestReport '{id}'.")
+    return Response(content=fragment, media_type="application/json")
+
+
 class TestSchema(BaseModel):
     foo: str
     bar: int
@@ -204,6 +624,7 @@ class TestSchema(BaseModel):
     },
 )
 async def update_resource(
+    request: Request,
     id: str = Path(..., description="The unique identifier of the resource."),
     patch_data_dict: dict = Body(..., description="The patch data for the resource."),
     response: Response = Response(status_code=status.HTTP_200_OK),
@@ -212,30 +633,27 @@ async def update_resource(
     if id in test_report_db:
         print(f"Test Report '{id}' found in memory.")
 
-        existing_report = test_report_db[id]
+        version = test_report_db.version(id)
         # # Validate the patch data against the structure of items within testResults
-        patched_test_results = []
         if isinstance(patch_data_dict.get("testResults"), list):
+            try:
+                # Brought to the hot tier off the event loop, for the update to find it there
+                await test_report_db.aget(id)
+            except KeyError:
+                pass  # deleted meanwhile; the update answers 404
             print(patch_data_dict["testResults"])
-
-            for item_data in patch_data_dict["testResults"]:
-                # Determine if the item is a TestCase or TestGroup and validate accordingly
-                if "groupItems" in item_data:
-                    print("TestGroup found")
-                    validated_item = TestGroup.model_validate(item_data)
-                else:
-                    print("TestCase found")
-                    validated_item = TestCase.model_validate(item_data)
-                patched_test_results.append(validated_item)
-
-            # Update the testResults in the existing report
-            updated_report = existing_report.model_copy(update={"testResults": patched_test_results})
-            test_report_db[id] = updated_report # Update in the database (in-memory here)
+            # Determine if each item is a TestCase or TestGroup and validate accordingly
+            # Sized by the body as read, which has no Content-Length once decompressed
+            patched_test_results = await run_off_loop(
+                len(await request.body()), parse_test_results, patch_data_dict["testResults"]
+            )
+            version = await patch_coalescer.submit(id, patched_test_results)
+            await test_report_db.aevict()
 
         print(f"Test Report '{id}' updated.")
         return JSONResponse(
             status_code=status.HTTP_200_OK,
-            content={"message": f"Resource '{id}' updated successfully."},
+            content={"message": f"Resource '{id}' updated successfully.", "version": version},
         )
 
     return JSONResponse(
@@ -261,6 +679,7 @@ async def delete_Test(
     Deletes an existing Test resource identified by its ID.
     """
     print(f"Received DELETE request for Test_id={id}")
+    patch_coalescer.flush(id)
 
     # # --- Check and delete Test ---
     if id not in test_report_db:
@@ -271,7 +690,7 @@ async def delete_Test(
         )
 
 
-    del test_report_db[id]
+    remove_report(id)
     print(f"Test Report '{id}' deleted from memory.")
 
     # Test_report_id = Test_db[id].TestReportReference
@@ -284,7 +703,446 @@ async def delete_Test(
     # # Return No Content response explicitly for clarity
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+# --- Expectation evaluation Endpoints ---
+@router.get(
+    "/{id}/evaluation",
+    summary="Evaluate expectation targets of a Test Report",
+    tags=["Test Management"],
+    responses={
+        200: {"description": "Evaluation of every expectation target against the recorded measurements"},
+        404: {"description": "Test report not found"},
+    },
+    response_model=ReportEvaluation,
+    response_model_exclude_none=True,
+)
+async def get_test_report_evaluation(
+    id: str = Path(..., description="The unique identifier of the Test Report."),
+):
+    """
+    Evaluates each `expectationTargets` entry of the report's test
+    specifications against the measurements of the same name, converting
+    units where needed, and derives PASS/FAIL per measurement and metric.
+    """
+    patch_coalescer.flush(id)
+    if id not in test_report_db:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    evaluation = expectation_engine.cached_result(id)
+    if evaluation is None:
+        try:
+            evaluation = await run_in_threadpool(evaluate_stored_report, id)
+        except KeyError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    return evaluation
+
+
+@router.post(
+    "/evaluations",
+    summary="Evaluate expectation targets of many Test Reports",
+    tags=["Test Management"],
+    response_model=Dict[str, ReportEvaluation],
+    response_model_exclude_none=True,
+)
+async def evaluate_test_reports(
+    testIds: Optional[List[str]] = Body(None, embed=True, description="Reports to evaluate; all stored reports when omitted."),
+):
+    """
+    Batch form of `/{id}/evaluation`, keyed by test id. Unknown ids are
+    left out of the response.
+    """
+    patch_coalescer.flush_all()
+    ids = testIds if testIds is not None else list(test_report_db)
+    results = {}
+    for report_id in ids:
+        if report_id not in test_report_db:
+            continue
+        evaluation = expectation_engine.cached_result(report_id)
+        if evaluation is None:
+            # Not evaluated yet: read without promoting and evaluate off the event loop
+            try:
+                evaluation = await run_in_threadpool(evaluate_stored_report, report_id)
+            except KeyError:
+                continue  # deleted meanwhile
+        results[report_id] = evaluation
+    return results
+
+
+def evaluate_stored_report(report_id: str) -> ReportEvaluation:
+    """Evaluates the current version of a stored report; the result is only kept if no write lands meanwhile."""
+    # Read before the report, so that a write in between makes the result stale rather than mislabeled
+    version = test_report_db.version(report_id)
+    return expectation_engine.result(report_id, test_report_db.peek(report_id), version)
+
+# --- Results archive Endpoints ---
+@router.put(
+    "/{id}/archive",
+    status_code=status.HTTP_201_CREATED,
+    summary="Upload the results archive of a Test Report",
+    tags=["Test Management"],
+    responses={
+        status.HTTP_201_CREATED: {"description": "Archive stored and indexed"},
+        status.HTTP_400_BAD_REQUEST: {"description": "Body is not a zip or tar archive"},
+        status.HTTP_404_NOT_FOUND: {"description": "Test report not found"},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"description": "Archive too large"},
+        status.HTTP_422_UNPROCESSABLE_ENTITY: {"description": "Referenced artifacts missing from the archive"},
+    },
+)
+async def upload_results_archive(
+    request: Request,
+    id: str = Path(..., description="The unique identifier of the Test Report the archive belongs to."),
+):
+    """
+    Stores the zip/tar results archive that `ArtifactsItem.path` and
+    `ConfigurationArtifactsItem.path` are relative to.
+
+    The request body is the raw archive. It is streamed to disk, indexed by
+    member path without extraction, and rejected if any artifact path
+    referenced by the report is missing from it.
+    """
+    print(f"Received archive upload for id={id}")
+    patch_coalescer.flush(id)
+    if id not in test_report_db:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+
+    upload_path = new_upload_path()
+    try:
+        written = 0
+        with open(upload_path, "wb") as fh:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > ARCHIVE_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Archive exceeds {ARCHIVE_MAX_BYTES} bytes.",
+                    )
+                await run_in_threadpool(fh.write, chunk)
+        archive = await run_in_threadpool(index_archive, upload_path)
+    except ArchiveError as exc:
+        os.remove(upload_path)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except BaseException:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        raise
+
+    # The upload may have taken long enough for PATCHes to arrive meanwhile
+    patch_coalescer.flush(id)
+    if id not in test_report_db:
+        os.remove(upload_path)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    try:
+        report = await test_report_db.aget(id)
+    except KeyError:
+        os.remove(upload_path)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TestReport with id '{id}' not found.")
+    missing = archive.missing(referenced_artifact_paths(report))
+    if missing:
+        os.remove(upload_path)
+        print(f"Archive for '{id}' is missing {len(missing)} referenced artifact(s).")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Referenced artifacts missing from the archive.", "missing": missing},
+        )
+
+    archive.file_path = archive_file_path(id)
+    os.replace(upload_path, archive.file_path)
+    archive_index[id] = archive
+    print(f"Archive for '{id}' stored with {len(archive.members)} member(s).")
+    return JSONResponse(
+        status_code=status.HTTP_201_CREATED,
+        content={"format": archive.format, "members": len(archive.members), "size": written},
+    )
+
+
+@router.get(
+    "/{id}/artifacts/{path:path}",
+    summary="Download an artifact from the results archive",
+    tags=["Test Management"],
+    responses={
+        200: {"description": "Artifact content"},
+        206: {"description": "Partial artifact content"},
+        404: {"description": "Archive or artifact not found"},
+        416: {"description": "Requested range not satisfiable"},
+    },
+)
+async def get_artifact(
+    request: Request,
+    id: str = Path(..., description="The unique identifier of the Test Report."),
+    path: str = Path(..., description="Path of the artifact, relative to the root of the results archive."),
+):
+    """
+    Serves a single member of the results archive. Supports HTTP Range
+    requests so large pcaps and logs can be fetched in parts.
+    """
+    archive = archive_index.get(id)
+    member = archive.get(path) if archive else None
+    if member is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Artifact '{path}' not found for '{id}'.")
+    try:
+        byte_range = parse_range(request.headers.get("range"), member.size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"content-range": f"bytes */{member.size}"},
+        )
+    return ArchiveMemberResponse(archive, member, byte_range)
+
+# --- Administration Endpoints ---
+@admin_router.get(
+    "/store/stats",
+    summary="Report store tiering metrics",
+    tags=[ADMIN_TAG],
+)
+async def get_store_stats():
+    """
+    Returns hit rate, eviction count and rehydration latency of the report
+    store, along with the current size of its hot and cold tiers.
+    """
+    return test_report_db.stats()
+
+
+@admin_router.get(
+    "/result-index/stats",
+    summary="testResults index metrics",
+    tags=[ADMIN_TAG],
+)
+async def get_result_index_stats():
+    return result_index.stats()
+
+
+@admin_router.get(
+    "/executor/stats",
+    summary="Validation/serialization pool metrics",
+    tags=[ADMIN_TAG],
+)
+async def get_executor_stats():
+    return execution_strategy.stats()
+
+
+@admin_router.get(
+    "/patch-coalescing/stats",
+    summary="PATCH write-coalescing metrics",
+    tags=[ADMIN_TAG],
+)
+async def get_patch_coalescing_stats():
+    return patch_coalescer.stats()
+
+
+@admin_router.get(
+    "/admission",
+    summary="Admission control and load-shedding metrics",
+    tags=[ADMIN_TAG],
+)
+async def get_admission_stats():
+    """
+    Returns, per route class (read/write), the units in flight, queue depth
+    and the number of requests admitted, queued, shed (503) and throttled (429).
+    """
+    return admission.stats()
+
+@admin_router.post(
+    "/profile",
+    status_code=status.HTTP_201_CREATED,
+    summary="Profile the next requests to a route",
+    tags=[ADMIN_TAG],
+)
+async def arm_profile_capture(spec: ProfileCaptureRequest = Body(...)):
+    """
+    Arms a capture for the next `requests` requests whose method and path
+    match. Fetch the result from `/admin/profile/{captureId}` once they
+    have completed.
+    """
+    capture = profiler.arm(spec)
+    print(f"Profile capture '{capture.id}' armed for {capture.method} {capture.path}.")
+    return capture.status()
+
+
+@admin_router.get(
+    "/profile",
+    summary="List pending profile captures",
+    tags=[ADMIN_TAG],
+)
+async def list_profile_captures():
+    return profiler.pending()
+
+
+@admin_router.get(
+    "/profile/continuous",
+    summary="Always-on sampling profile",
+    tags=[ADMIN_TAG],
+    responses={404: {"description": "Continuous sampling is disabled"}},
+)
+async def get_continuous_profile(
+    format: Literal["collapsed", "summary"] = Query("collapsed", description="Collapsed stacks or per-model summary."),
+):
+    """
+    Returns the stacks collected by the low-rate sampler enabled with
+    PROFILE_CONTINUOUS_INTERVAL, or the time attributed to each model in
+    `modules/`.
+    """
+    if profiler.continuous is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Continuous sampling is disabled.")
+    if format == "summary":
+        return profiler.continuous.summary()
+    return Response(content=profiler.continuous.collapsed(), media_type="text/plain")
+
+
+@admin_router.get(
+    "/profile/{capture_id}",
+    summary="Retrieve a profile capture",
+    tags=[ADMIN_TAG],
+    responses={
+        200: {"description": "Collapsed stacks (sample mode) or pstats listing (cprofile mode)"},
+        202: {"description": "Capture still in progress"},
+        404: {"description": "Capture not found"},
+    },
+)
+async def get_profile_capture(capture_id: str = Path(..., description="Identifier returned when the capture was armed.")):
+    capture = profiler.captures.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Profile capture '{capture_id}' not found.")
+    if not capture.done:
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=capture.status())
+    return Response(content=capture.dump(), media_type="text/plain")
+
+@admin_router.get(
+    "/retention",
+    summary="Retention policies and scheduler metrics",
+    tags=[ADMIN_TAG],
+)
+async def get_retention_stats():
+    return retention_scheduler.stats()
+
+
+@admin_router.post(
+    "/retention/run",
+    summary="Run a retention pass now",
+    tags=[ADMIN_TAG],
+    responses={202: {"description": "Pass scheduled on the running background task"}},
+)
+async def run_retention_pass():
+    """
+    Wakes the background scheduler, or runs a pass inline when the
+    scheduler is not running (e.g. no policy is configured).
+    """
+    if retention_scheduler.stats()["running"]:
+        retention_scheduler.trigger()
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=retention_scheduler.stats())
+    await retention_scheduler.run_pass()
+    return retention_scheduler.stats()
+
+
+def iter_stored_reports():
+    """(testId, version, report) for every stored report, without churning the hot tier."""
+    for report_id in list(test_report_db):
+        try:
+            yield report_id, test_report_db.version(report_id), test_report_db.peek(report_id)
+        except KeyError:
+            continue  # deleted meanwhile
+
+
+def restore_snapshot(archive_path: str, directory: str) -> Set[str]:
+    """Loads every report of an uploaded snapshot into the store, replacing reports with the same id.
+    Returns the ids restored."""
+    restored: Set[str] = set()
+    for test_id, report, size in read_snapshot(extract_reports_file(archive_path, directory)):
+        test_report_db.put(test_id, report, size=size)
+        report_digests.pop(test_id, None)
+        config_index.add(test_id, report)
+        expectation_engine.forget(test_id)
+        result_index.forget(test_id)
+        retention_scheduler.track(test_id, report)
+        restored.add(test_id)
+    return restored
+
+
+@admin_router.get(
+    "/snapshot",
+    summary="Export every stored report as a binary snapshot",
+    tags=[ADMIN_TAG],
+    responses={
+        200: {"description": "Tar archive holding reports.parquet and measurements.parquet", "content": {"application/x-tar": {}}},
+        501: {"description": "pyarrow is not installed"},
+    },
+)
+async def export_snapshot():
+    """
+    Streams a tar archive with two Parquet files: `reports.parquet`, one row
+    per report with flat metadata columns plus the full report, and
+    `measurements.parquet`, one typed row per measurement value. Both can be
+    loaded directly by Parquet-aware analytics tools.
+    """
+    patch_coalescer.flush_all()
+    directory = make_spool_dir()
+    try:
+        count = await run_in_threadpool(write_snapshot, iter_stored_reports(), directory)
+    except SnapshotUnavailable as exc:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(exc))
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    print(f"Snapshot of {count} Test Report(s) written.")
+    return StreamingResponse(
+        stream_tar(directory, [REPORTS_FILE, MEASUREMENTS_FILE]),
+        media_type="application/x-tar",
+        headers={"Content-Disposition": 'attachment; filename="snapshot.tar"', "X-Snapshot-Reports": str(count)},
+    )
+
+
+@admin_router.put(
+    "/snapshot",
+    summary="Restore reports from a binary snapshot",
+    tags=[ADMIN_TAG],
+    responses={
+        200: {"description": "Snapshot restored"},
+        400: {"description": "Body is not a snapshot, or holds an invalid report"},
+        413: {"description": "Snapshot too large"},
+        501: {"description": "pyarrow is not installed"},
+    },
+)
+async def import_snapshot(request: Request):
+    """
+    Replaces the stored reports with those of a snapshot produced by
+    `GET /admin/snapshot`. The body is streamed to disk and read one row
+    group at a time; every report is validated. Once the whole snapshot is
+    read, reports it does not hold are deleted along with their results
+    archives. Reports before an invalid one stay restored, and then nothing
+    is deleted.
+    """
+    directory = make_spool_dir()
+    try:
+        upload_path = os.path.join(directory, "upload.tar")
+        written = 0
+        with open(upload_path, "wb") as fh:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > SNAPSHOT_MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Snapshot exceeds {SNAPSHOT_MAX_UPLOAD_BYTES} bytes.",
+                    )
+                await run_in_threadpool(fh.write, chunk)
+        # Pending PATCHes apply to the reports being replaced, not to the restored ones
+        patch_coalescer.flush_all()
+        restored = await run_in_threadpool(restore_snapshot, upload_path, directory)
+    except SnapshotUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(exc))
+    except SnapshotError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except ValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=convert_validation_errors(exc))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    # Drop what the snapshot does not hold, with its index entries, digest, evaluation and archive
+    patch_coalescer.flush_all()
+    deleted = [report_id for report_id in list(test_report_db) if report_id not in restored]
+    for report_id in deleted:
+        remove_report(report_id)
+    print(f"Snapshot restored with {len(restored)} Test Report(s), {len(deleted)} deleted.")
+    return {"reports": len(restored), "deleted": len(deleted)}
+
 app.include_router(router)
+app.include_router(admin_router)
 # app.add_exception_handler(RequestValidationError, request_validation_exception_handler)
 # # --- Update Forward References ---
 # # Crucial step: Call rebuild for models that might use forward refs directly
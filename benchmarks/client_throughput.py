@@ -0,0 +1,93 @@
+"""PUT throughput of TestReportClient against one request at a time.
+
+"naive" mirrors the hand-rolled scripts: a new HTTP client per request and
+the stdlib json module. "client" is TestReportClient.put_reports with
+pooled connections and bounded concurrency:
+
+    python benchmarks/client_throughput.py [--reports 200] [--values 2000] [--concurrency 8] [--url URL]
+
+Without --url the API runs in-process (httpx ASGI transport, no network),
+which leaves out connection set-up and so understates the difference.
+Requires httpx, see the `client` extra.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+BASE = "/ProvMnS/v1alpha1/SubNetwork"
+
+
+def make_reports(prefix: str, count: int, values: int) -> list:
+    with open(os.path.join(ROOT, "examples", "put.json")) as fh:
+        template = json.load(fh)
+    with open(os.path.join(ROOT, "examples", "patch.json")) as fh:
+        test_case = json.load(fh)["testResults"][0]
+    test_case = copy.deepcopy(test_case)
+    test_case["metrics"][0]["measurements"][0]["values"] = [i * 0.5 for i in range(values)]
+    reports = []
+    for i in range(count):
+        report = copy.deepcopy(template)
+        report["testMetadata"]["testId"] = f"{prefix}-{i}"
+        report["testResults"] = [test_case]
+        reports.append(report)
+    return reports
+
+
+async def naive(reports: list, url: str, app) -> float:
+    import httpx
+
+    started = time.perf_counter()
+    for report in reports:
+        transport = httpx.ASGITransport(app=app) if app is not None else None
+        async with httpx.AsyncClient(transport=transport, base_url=url) as http:
+            response = await http.put(
+                f"{BASE}/{report['testMetadata']['testId']}",
+                content=json.dumps(report), headers={"content-type": "application/json"},
+            )
+            assert response.status_code in (200, 201, 204), response.status_code
+    return time.perf_counter() - started
+
+
+async def pooled(reports: list, url: str, app, concurrency: int, compress: bool) -> float:
+    from test_management_exposure.client import TestReportClient
+
+    started = time.perf_counter()
+    async with TestReportClient(url, app=app, compress_min_bytes=16 * 1024 if compress else None) as client:
+        results = await client.put_reports(reports, concurrency=concurrency)
+    assert all(r.ok for r in results), [r for r in results if not r.ok][:3]
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200, help="Reports PUT per run.")
+    parser.add_argument("--values", type=int, default=2000, help="Measurement values per report.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight for the client.")
+    parser.add_argument("--compress", action="store_true", help="gzip request bodies from 16 KiB on.")
+    parser.add_argument("--url", help="Base URL of a running server; in-process when omitted.")
+    args = parser.parse_args()
+
+    app = None
+    if args.url is None:
+        sys.stdout = open(os.devnull, "w")  # silence the handlers' prints
+        from api_server import app
+    url = args.url or "http://in-process"
+
+    runs = {
+        "naive": await naive(make_reports("naive", args.reports, args.values), url, app),
+        "client": await pooled(make_reports("client", args.reports, args.values), url, app, args.concurrency, args.compress),
+    }
+    out = sys.__stdout__
+    for name, seconds in runs.items():
+        out.write(json.dumps({"mode": name, "reports": args.reports, "seconds": round(seconds, 3),
+                              "reportsPerSecond": round(args.reports / seconds, 1)}) + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
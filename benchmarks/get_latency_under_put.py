@@ -0,0 +1,125 @@
+"""GET latency while large PUTs are being validated.
+
+Runs the API in-process (httpx ASGI transport, no network) once per
+execution strategy and reports GET latency percentiles for a small report
+while several multi-megabyte reports are PUT concurrently:
+
+    python benchmarks/get_latency_under_put.py [--values 300000] [--puts 8] [--rounds 5]
+
+"inline" is the behaviour before validation was moved off the event loop.
+Admission control is off (ADMISSION_ENABLED=0) unless set in the
+environment; with it on, writers are told apart by X-Client-Id and may be
+answered 429/503.
+Requires httpx, which is not a runtime dependency of the service.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE = "/ProvMnS/v1alpha1/SubNetwork"
+
+
+def make_report(test_id: str, values: int) -> bytes:
+    with open(os.path.join(ROOT, "examples", "put.json")) as fh:
+        report = json.load(fh)
+    with open(os.path.join(ROOT, "examples", "patch.json")) as fh:
+        test_case = json.load(fh)["testResults"][0]
+    report["testMetadata"]["testId"] = test_id
+    if values:
+        test_case = copy.deepcopy(test_case)
+        test_case["metrics"][0]["measurements"][0]["values"] = [i * 0.5 for i in range(values)]
+        report["testResults"] = [test_case]
+    return json.dumps(report).encode()
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, max(int(len(sorted_values) * fraction + 0.5) - 1, 0))]
+
+
+async def run(values: int, puts: int, rounds: int, interval: float) -> dict:
+    import httpx
+    from api_server import app, execution_strategy
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.put(f"{BASE}/small", content=make_report("small", 0))
+        bodies = [make_report(f"large-{i}", values) for i in range(puts)]
+        # Warm up the pools (process start-up) outside the measurement
+        await client.put(f"{BASE}/warmup", content=make_report("warmup", values))
+        latencies = []
+        done = asyncio.Event()
+
+        async def reader():
+            while not done.is_set():
+                started = time.perf_counter()
+                response = await client.get(f"{BASE}/small", headers={"x-client-id": "reader"})
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                await asyncio.sleep(interval)
+
+        async def writer(i: int, body: bytes):
+            headers = {"x-client-id": f"writer-{i}"}
+            for _ in range(rounds):
+                response = await client.put(f"{BASE}/large-{i}", content=body, headers=headers)
+                # Shed by admission control or a saturated executor
+                assert response.status_code in (201, 429, 503), response.status_code
+                await client.delete(f"{BASE}/large-{i}", headers=headers)
+
+        reader_task = asyncio.create_task(reader())
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(i, body) for i, body in enumerate(bodies)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await reader_task
+    execution_strategy.shutdown()
+
+    latencies.sort()
+    return {
+        "strategy": execution_strategy.strategy,
+        "bodyBytes": len(bodies[0]),
+        "putWallSeconds": round(elapsed, 3),
+        "gets": len(latencies),
+        "getP50ms": round(statistics.median(latencies) * 1000, 2),
+        "getP99ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "getMaxms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--values", type=int, default=300_000, help="Measurement values per large report.")
+    parser.add_argument("--puts", type=int, default=8, help="Concurrent large PUTs.")
+    parser.add_argument("--rounds", type=int, default=5, help="PUTs per concurrent writer.")
+    parser.add_argument("--interval", type=float, default=0.002, help="Pause between GETs in seconds.")
+    parser.add_argument("--strategy", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.strategy:
+        # Child run: the strategy is read from the environment at import time
+        sys.path.insert(0, ROOT)
+        sys.stdout = open(os.devnull, "w")  # silence the handlers' prints
+        result = asyncio.run(run(args.values, args.puts, args.rounds, args.interval))
+        sys.__stdout__.write(json.dumps(result) + "\n")
+        return
+
+    for strategy in ("inline", "auto"):
+        env = dict(os.environ, EXECUTOR_STRATEGY=strategy)
+        env.setdefault("ADMISSION_ENABLED", "0")
+        env.setdefault("ADMISSION_TRUST_CLIENT_HEADER", "1")
+        out = subprocess.run(
+            [sys.executable, __file__, "--strategy", strategy, "--values", str(args.values),
+             "--puts", str(args.puts), "--rounds", str(args.rounds), "--interval", str(args.interval)],
+            env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        print(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
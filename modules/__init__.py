@@ -1 +0,0 @@
-from modules.configuration import ConfigurationParameters
\ No newline at end of file
@@ -0,0 +1 @@
+"""Test report management: report models (`modules`) and the async API client (`client`)."""
@@ -0,0 +1,4 @@
+"""Async client of the Test report API, see TestReportClient."""
+from test_management_exposure.client.report_client import BatchResult, ClientError, TestReportClient
+
+__all__ = ["BatchResult", "ClientError", "TestReportClient"]
@@ -0,0 +1,248 @@
+import asyncio
+import random
+import zlib
+from urllib.parse import quote
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import httpx
+except ImportError:  # optional dependency, see the `client` extra
+    httpx = None
+
+from pydantic import TypeAdapter
+from pydantic_core import from_json, to_json
+
+from test_management_exposure.modules.test_report import TestReport
+from test_management_exposure.modules.test_result import TestCase, TestGroup
+
+BASE_PATH = "/ProvMnS/v1alpha1/SubNetwork"
+
+ReportLike = Union[TestReport, Dict[str, Any], bytes]
+TestResultsLike = Union[List[Union[TestCase, TestGroup]], List[Dict[str, Any]]]
+
+_test_results = TypeAdapter(List[Union[TestCase, TestGroup]])
+
+
+class ClientError(Exception):
+    """Raised for a response with an error status, after any retries."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(f"HTTP {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class BatchResult:
+    """Outcome of one operation of a batch; `error` is set instead of raising."""
+
+    __slots__ = ("test_id", "status_code", "version", "error")
+
+    def __init__(self, test_id: str, status_code: Optional[int] = None, version: Optional[int] = None, error: Optional[Exception] = None):
+        self.test_id = test_id
+        self.status_code = status_code
+        self.version = version
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return f"BatchResult({self.test_id!r}, status_code={self.status_code}, error={self.error!r})"
+
+
+def _segment(value: str) -> str:
+    """A test id or number as one URL path segment, so that '/', '?' or '#' in it stay part of it."""
+    return quote(value, safe="")
+
+
+class TestReportClient:
+    """Async client of the Test report API.
+
+    One client keeps a pool of keep-alive connections; create it once and
+    share it, e.g. `async with TestReportClient(url) as client: ...`.
+
+    - `validate=False` skips client-side validation of reports and patches
+      built from dicts; only use it for data already known to be valid.
+    - `compress_min_bytes` gzip-compresses request bodies of at least that
+      size (None disables compression).
+    - Requests answered with 429 or 503 are retried up to `retries` times,
+      waiting for Retry-After when the server sends it and with jittered
+      exponential backoff otherwise.
+    - `app` runs requests against an in-process ASGI application instead of
+      the network, e.g. `TestReportClient(app=api_server.app)`.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        *,
+        app=None,
+        client_id: Optional[str] = None,
+        validate: bool = True,
+        compress_min_bytes: Optional[int] = None,
+        retries: int = 5,
+        backoff: float = 0.25,
+        max_connections: int = 32,
+        timeout: float = 60.0,
+        http2: bool = False,
+    ):
+        if httpx is None:
+            raise ImportError("TestReportClient needs httpx: install the 'client' extra.")
+        self.validate = validate
+        self.compress_min_bytes = compress_min_bytes
+        self.retries = retries
+        self.backoff = backoff
+        headers = {"x-client-id": client_id} if client_id else {}
+        if app is not None:
+            transport = httpx.ASGITransport(app=app)
+            base_url = "http://in-process"
+        else:
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                http2=http2,
+            )
+        self._http = httpx.AsyncClient(base_url=base_url, transport=transport, headers=headers, timeout=timeout)
+
+    async def __aenter__(self) -> "TestReportClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    # --- Encoding ---
+
+    def encode_report(self, report: ReportLike) -> Tuple[str, bytes]:
+        """(testId, JSON body) of a report given as a model, a dict or JSON bytes."""
+        if isinstance(report, bytes):
+            if self.validate:
+                model = TestReport.model_validate_json(report)
+                return model.testMetadata.testId, report
+            return from_json(report)["testMetadata"]["testId"], report
+        if isinstance(report, dict) and self.validate:
+            report = TestReport.model_validate(report)
+        if isinstance(report, TestReport):
+            # Unset fields are left out, as some validators look at which keys are present
+            return report.testMetadata.testId, report.__pydantic_serializer__.to_json(report, by_alias=True, exclude_unset=True)
+        return report["testMetadata"]["testId"], to_json(report)
+
+    def encode_test_results(self, test_results: TestResultsLike) -> bytes:
+        if self.validate:
+            test_results = _test_results.validate_python(test_results)
+        if test_results and not isinstance(test_results[0], dict):
+            return b'{"testResults":' + _test_results.dump_json(test_results, by_alias=True, exclude_unset=True) + b"}"
+        return to_json({"testResults": test_results})
+
+    # --- Requests ---
+
+    async def request(self, method: str, path: str, content: Optional[bytes] = None, **kwargs) -> "httpx.Response":
+        """Send a request for `path`, relative to the report collection, compressing the
+        body and retrying 429/503 as configured."""
+        path = BASE_PATH + path
+        headers = dict(kwargs.pop("headers", None) or {})
+        if content is not None:
+            headers["content-type"] = "application/json"
+            if self.compress_min_bytes is not None and len(content) >= self.compress_min_bytes:
+                compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                content = compressor.compress(content) + compressor.flush()
+                headers["content-encoding"] = "gzip"
+        for attempt in range(self.retries + 1):
+            response = await self._http.request(method, path, content=content, headers=headers, **kwargs)
+            if response.status_code not in (429, 503) or attempt == self.retries:
+                break
+            retry_after = response.headers.get("retry-after", "")
+            delay = float(retry_after) if retry_after.replace(".", "", 1).isdigit() else self.backoff * 2 ** attempt
+            await asyncio.sleep(delay * (1 + random.random() / 4))
+        if response.status_code >= 400:
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            detail = body.get("detail", body) if isinstance(body, dict) else response.text
+            raise ClientError(response.status_code, detail)
+        return response
+
+    async def put_report(self, report: ReportLike) -> int:
+        """Create or replace a report. Returns 201 (created), 200 (replaced) or 204 (unchanged)."""
+        test_id, body = self.encode_report(report)
+        return (await self.request("PUT", f"/{_segment(test_id)}", body)).status_code
+
+    async def get_report(self, test_id: str) -> Union[TestReport, Dict[str, Any]]:
+        """The report as a TestReport, or as a plain dict with `validate=False`."""
+        response = await self.request("GET", f"/{_segment(test_id)}")
+        return TestReport.model_validate_json(response.content) if self.validate else response.json()
+
+    async def patch_test_results(self, test_id: str, test_results: TestResultsLike) -> int:
+        """Replace the testResults of a report. Returns the new report version."""
+        response = await self.request("PATCH", f"/{_segment(test_id)}", self.encode_test_results(test_results))
+        return response.json()["version"]
+
+    async def delete_report(self, test_id: str) -> None:
+        await self.request("DELETE", f"/{_segment(test_id)}")
+
+    async def get_test_result(self, test_id: str, number: str) -> Dict[str, Any]:
+        return (await self.request("GET", f"/{_segment(test_id)}/testResults/{_segment(number)}")).json()
+
+    async def iter_test_results(
+        self, test_id: str, status: Optional[str] = None, result: Optional[str] = None, page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the test cases of a report page by page, following the server's cursors."""
+        params: Dict[str, Any] = {"limit": page_size}
+        if status:
+            params["status"] = status
+        if result:
+            params["result"] = result
+        while True:
+            page = (await self.request("GET", f"/{_segment(test_id)}/testResults", params=params)).json()
+            for item in page["items"]:
+                yield item
+            if not page["nextCursor"]:
+                return
+            params["cursor"] = page["nextCursor"]
+
+    async def query(self, **criteria: Union[str, List[str]]) -> List[str]:
+        """Test ids of reports whose configuration parameters match, e.g. `query(band5G="n78", numMimoLayers="ge:4")`."""
+        return (await self.request("GET", "", params=criteria)).json()["testIds"]
+
+    # --- Batches ---
+
+    async def put_reports(self, reports: Iterable[ReportLike], concurrency: int = 8) -> List[BatchResult]:
+        """PUT many reports with at most `concurrency` requests in flight; results keep the input order."""
+
+        async def put(report: ReportLike) -> BatchResult:
+            test_id = None
+            try:
+                test_id, body = self.encode_report(report)
+                return BatchResult(test_id, (await self.request("PUT", f"/{_segment(test_id)}", body)).status_code)
+            except Exception as exc:
+                return BatchResult(test_id, getattr(exc, "status_code", None), error=exc)
+
+        return await _bounded(map(put, reports), concurrency)
+
+    async def patch_reports(self, patches: Iterable[Tuple[str, TestResultsLike]], concurrency: int = 8) -> List[BatchResult]:
+        """PATCH the testResults of many reports, given as (testId, testResults) pairs."""
+
+        async def patch(test_id: str, test_results: TestResultsLike) -> BatchResult:
+            try:
+                response = await self.request("PATCH", f"/{_segment(test_id)}", self.encode_test_results(test_results))
+                return BatchResult(test_id, response.status_code, version=response.json()["version"])
+            except Exception as exc:
+                return BatchResult(test_id, getattr(exc, "status_code", None), error=exc)
+
+        return await _bounded((patch(test_id, results) for test_id, results in patches), concurrency)
+
+
+async def _bounded(coroutines: Iterable, concurrency: int) -> List[Any]:
+    """Await coroutines with at most `concurrency` running, created lazily so inputs can be generators."""
+    results: Dict[int, Any] = {}
+    iterator = enumerate(coroutines)
+
+    async def worker() -> None:
+        for index, coroutine in iterator:
+            results[index] = await coroutine
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return [results[i] for i in range(len(results))]
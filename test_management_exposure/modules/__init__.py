@@ -0,0 +1 @@
+from test_management_exposure.modules.configuration import ConfigurationParameters
\ No newline at end of file
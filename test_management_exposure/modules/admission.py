@@ -0,0 +1,280 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple
+
+# Set to 0 to admit every request unconditionally.
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") != "0"
+# A request costs one unit plus one per this many body bytes (Content-Length).
+ADMISSION_BYTES_PER_UNIT = int(os.environ.get("ADMISSION_BYTES_PER_UNIT", str(256 * 1024)))
+# Units in flight across all clients, per route class.
+ADMISSION_READ_CAPACITY = int(os.environ.get("ADMISSION_READ_CAPACITY", "256"))
+ADMISSION_WRITE_CAPACITY = int(os.environ.get("ADMISSION_WRITE_CAPACITY", "64"))
+# Units in flight for a single client, per route class; over this the client gets 429.
+ADMISSION_CLIENT_READ_UNITS = int(os.environ.get("ADMISSION_CLIENT_READ_UNITS", "32"))
+ADMISSION_CLIENT_WRITE_UNITS = int(os.environ.get("ADMISSION_CLIENT_WRITE_UNITS", "16"))
+# Bulk exports: requests in flight in total and per client. Over either they are shed.
+ADMISSION_BULK_CAPACITY = int(os.environ.get("ADMISSION_BULK_CAPACITY", "4"))
+ADMISSION_CLIENT_BULK_UNITS = int(os.environ.get("ADMISSION_CLIENT_BULK_UNITS", "1"))
+# Requests allowed to wait for write capacity, and for how long, before they are shed with 503.
+ADMISSION_QUEUE_DEPTH = int(os.environ.get("ADMISSION_QUEUE_DEPTH", "64"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+# Clients are told apart by peer address. Set ADMISSION_TRUST_CLIENT_HEADER=1 to use this
+# request header instead, only behind a proxy that sets it, since callers could rotate it.
+ADMISSION_CLIENT_HEADER = os.environ.get("ADMISSION_CLIENT_HEADER", "x-client-id")
+ADMISSION_TRUST_CLIENT_HEADER = os.environ.get("ADMISSION_TRUST_CLIENT_HEADER", "0") == "1"
+
+READ = "read"
+WRITE = "write"
+BULK = "bulk"
+_READ_METHODS = ("GET", "HEAD")
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted; carries the HTTP status and a Retry-After estimate."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _RouteClass:
+    """Weighted in-flight limit with a bounded FIFO wait queue."""
+
+    def __init__(self, name: str, capacity: int, client_units: int, queue_depth: int):
+        self.name = name
+        self.capacity = capacity
+        self.client_units = client_units
+        self.queue_depth = queue_depth
+        self.in_use = 0
+        self.clients: Dict[str, int] = {}
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        # Moving average of how long an admitted unit is held, for Retry-After
+        self.service_seconds = 0.05
+        self.admitted = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.shed = 0
+        self.throttled = 0
+        self.timed_out = 0
+
+    def retry_after(self) -> int:
+        backlog = self.in_use + sum(cost for cost, _ in self._waiters)
+        return max(1, math.ceil(self.service_seconds * backlog / self.capacity))
+
+    async def acquire(self, client: str, cost: int, timeout: float) -> None:
+        held = self.clients.get(client, 0)
+        # A single request above the per-client limit is still admitted on its own
+        if held and held + cost > self.client_units:
+            self.throttled += 1
+            raise Rejected(429, f"Too many concurrent {self.name} requests from this client.", self.retry_after())
+        if not self._waiters and self.in_use + cost <= self.capacity:
+            self._grant(client, cost)
+            return
+        if not self.queue_depth or len(self._waiters) >= self.queue_depth:
+            self.shed += 1
+            raise Rejected(503, f"Server is at {self.name} capacity.", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (cost, waiter)
+        self._waiters.append(entry)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        # The client's share is reserved while it waits so that it cannot flood the queue
+        self.clients[client] = held + cost
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the wait ended: hand the units back
+                self.in_use -= cost
+            else:
+                self._waiters.remove(entry)
+            self._release_client(client, cost)
+            self._wake()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            self.shed += 1
+            raise Rejected(503, f"Timed out waiting for {self.name} capacity.", self.retry_after()) from None
+        self.admitted += 1
+
+    def _grant(self, client: str, cost: int) -> None:
+        self.in_use += cost
+        self.clients[client] = self.clients.get(client, 0) + cost
+        self.admitted += 1
+
+    def release(self, client: str, cost: int, held_seconds: float) -> None:
+        self.in_use -= cost
+        self._release_client(client, cost)
+        self.service_seconds += 0.1 * (held_seconds / cost - self.service_seconds)
+        self._wake()
+
+    def _release_client(self, client: str, cost: int) -> None:
+        remaining = self.clients.get(client, 0) - cost
+        if remaining > 0:
+            self.clients[client] = remaining
+        else:
+            self.clients.pop(client, None)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_use + self._waiters[0][0] <= self.capacity:
+            cost, waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_use += cost
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "clientUnits": self.client_units,
+            "inUse": self.in_use,
+            "queueDepth": len(self._waiters),
+            "maxQueueDepth": self.max_queue_depth,
+            "activeClients": len(self.clients),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "timedOut": self.timed_out,
+            "serviceSecondsPerUnit": self.service_seconds,
+        }
+
+
+class Admission:
+    """Units held by an admitted request, returned on `release`."""
+
+    __slots__ = ("route_class", "client", "cost", "started")
+
+    def __init__(self, route_class: Optional[_RouteClass], client: str, cost: int):
+        self.route_class = route_class
+        self.client = client
+        self.cost = cost
+        self.started = time.perf_counter()
+
+    def release(self) -> None:
+        if self.route_class is not None:
+            self.route_class.release(self.client, self.cost, time.perf_counter() - self.started)
+            self.route_class = None
+
+
+class AdmissionController:
+    """Caps in-flight work per route class and per client.
+
+    GET/HEAD requests form the read class, a priority lane with its own
+    capacity: they never wait behind writes and are shed only when reads
+    themselves are over capacity. Reads under `bulk_prefixes` (exports of
+    many reports) are not cheap and get a small bulk class of their own.
+    Every other method is a write, costing one unit plus one per
+    ADMISSION_BYTES_PER_UNIT of declared body, so a client uploading large
+    reports reaches its limit sooner. A client over its own limit gets 429;
+    when the class as a whole is full, writes wait in a bounded queue and
+    are shed with 503 once it is full or they time out.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ADMISSION_ENABLED,
+        bytes_per_unit: int = ADMISSION_BYTES_PER_UNIT,
+        queue_timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS,
+        client_header: str = ADMISSION_CLIENT_HEADER,
+        trust_client_header: bool = ADMISSION_TRUST_CLIENT_HEADER,
+        bulk_prefixes: Sequence[str] = (),
+    ):
+        self.enabled = enabled
+        self.bytes_per_unit = bytes_per_unit
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.client_header = client_header
+        self.trust_client_header = trust_client_header
+        self.bulk_prefixes = tuple(bulk_prefixes)
+        self.classes = {
+            READ: _RouteClass(READ, ADMISSION_READ_CAPACITY, ADMISSION_CLIENT_READ_UNITS, 0),
+            WRITE: _RouteClass(WRITE, ADMISSION_WRITE_CAPACITY, ADMISSION_CLIENT_WRITE_UNITS, ADMISSION_QUEUE_DEPTH),
+            BULK: _RouteClass(BULK, ADMISSION_BULK_CAPACITY, ADMISSION_CLIENT_BULK_UNITS, 0),
+        }
+
+    def cost(self, route_class: _RouteClass, content_length: Optional[str]) -> int:
+        if route_class.name != WRITE:
+            return 1
+        if content_length is None or not content_length.isdigit():
+            # Unknown (chunked) body: assume it is as large as the client is allowed
+            return route_class.client_units
+        # Capped so that one request can always be admitted on an idle server
+        return min(1 + int(content_length) // self.bytes_per_unit, route_class.capacity)
+
+    def route_class(self, method: str, path: str) -> _RouteClass:
+        if method not in _READ_METHODS:
+            return self.classes[WRITE]
+        return self.classes[BULK if path.startswith(self.bulk_prefixes) else READ]
+
+    async def admit(self, method: str, path: str, headers, peer: Optional[str]) -> Admission:
+        """Admit a request or raise Rejected."""
+        client = (headers.get(self.client_header) if self.trust_client_header else None) or peer or "unknown"
+        if not self.enabled:
+            return Admission(None, client, 0)
+        route_class = self.route_class(method, path)
+        cost = self.cost(route_class, headers.get("content-length"))
+        await route_class.acquire(client, cost, self.queue_timeout)
+        return Admission(route_class, client, cost)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "bytesPerUnit": self.bytes_per_unit,
+            "queueTimeoutMs": self.queue_timeout * 1000,
+            "trustClientHeader": self.trust_client_header,
+            **{name: route_class.stats() for name, route_class in self.classes.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests under `path_prefix` through an AdmissionController.
+
+    Units are held until the last body chunk of the response is sent, so
+    streamed exports and downloads count for as long as they transfer.
+    """
+
+    def __init__(self, app, controller: AdmissionController, path_prefix: str = "/"):
+        self.app = app
+        self.controller = controller
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        peer = scope["client"][0] if scope.get("client") else None
+        try:
+            ticket = await self.controller.admit(scope["method"], scope["path"], headers, peer)
+        except Rejected as exc:
+            return await _reply(send, exc)
+
+        async def releasing_send(message):
+            try:
+                await send(message)
+            finally:
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    ticket.release()
+
+        try:
+            await self.app(scope, receive, releasing_send)
+        finally:
+            ticket.release()
+
+
+async def _reply(send, exc: Rejected) -> None:
+    body = json.dumps({"detail": exc.detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": exc.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(exc.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
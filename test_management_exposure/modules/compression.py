@@ -0,0 +1,92 @@
+import json
+import zlib
+from typing import Optional
+
+from starlette.exceptions import HTTPException
+
+# Content-Encoding values accepted on request bodies
+_ENCODINGS = {b"gzip", b"x-gzip", b"deflate"}
+
+
+class _Rejected(HTTPException):
+    """An HTTPException, so that routes reading the body (FastAPI's own body
+    parsing included) let it through with its status rather than answering 400."""
+
+
+class RequestDecompression:
+    """ASGI middleware inflating gzip/deflate request bodies chunk by chunk.
+
+    Applies to paths under `path_prefix`. The decoded body is capped at
+    `max_bytes` (413); Content-Encoding and Content-Length are removed, so
+    handlers see an uncompressed body of unknown length. Other encodings
+    get 415.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefix: str = "/"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+        encoding: Optional[bytes] = None
+        headers = []
+        for name, value in scope["headers"]:
+            if name == b"content-encoding":
+                encoding = value.strip().lower()
+            elif name != b"content-length":
+                headers.append((name, value))
+        if encoding in (None, b"identity"):
+            return await self.app(scope, receive, send)
+        if encoding not in _ENCODINGS:
+            return await _reply(send, 415, f"Unsupported Content-Encoding '{encoding.decode(errors='replace')}'.")
+
+        # 32 + MAX_WBITS detects the gzip or zlib header
+        decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        received = 0
+        started = False
+
+        async def inflating_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            limit = self.max_bytes - received + 1
+            try:
+                body = decompressor.decompress(message.get("body", b""), limit)
+                # Input left over means the output reached the limit; flush() is
+                # unbounded, so it only runs once all input has been inflated
+                if decompressor.unconsumed_tail or len(body) >= limit:
+                    raise _Rejected(413, f"Decompressed body exceeds {self.max_bytes} bytes.")
+                if not message.get("more_body", False):
+                    body += decompressor.flush()
+            except zlib.error as exc:
+                raise _Rejected(400, f"Invalid {encoding.decode()} body: {exc}") from None
+            received += len(body)
+            if received > self.max_bytes:
+                raise _Rejected(413, f"Decompressed body exceeds {self.max_bytes} bytes.")
+            return {**message, "body": body}
+
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app({**scope, "headers": headers}, inflating_receive, tracking_send)
+        except _Rejected as exc:
+            if started:
+                raise
+            await _reply(send, exc.status_code, exc.detail)
+
+
+async def _reply(send, status_code: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
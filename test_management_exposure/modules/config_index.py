@@ -0,0 +1,264 @@
+import bisect
+import threading
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from test_management_exposure.modules.configuration import ConfigurationParameters
+
+Number = Union[int, float]
+
+# Comparison prefixes accepted on numeric query values, e.g. numMimoLayers=ge:4
+NUMERIC_OPERATORS = ("ge", "gt", "le", "lt", "eq")
+
+
+class QueryError(ValueError):
+    """Raised when a configuration query cannot be parsed."""
+
+
+def _term(value) -> Optional[str]:
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return value
+    return None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def iter_configuration_parameters(report) -> Iterator[ConfigurationParameters]:
+    """Every ConfigurationParameters of a report: test metadata and testbed components."""
+    yield from report.testMetadata.configurationParameters or []
+    for component in report.testbedComponents or []:
+        if component.configurationParameters is not None:
+            yield component.configurationParameters
+
+
+def extract_fields(params: ConfigurationParameters) -> Iterator[Tuple[str, object]]:
+    """(field, value) pairs of one ConfigurationParameters, keyed by JSON name.
+
+    Lists of scalars (e.g. band5G) yield one pair per element. Vendor extras
+    allowed by `extra='allow'` are included; nested objects are skipped.
+    """
+    values = params.model_dump(by_alias=True, exclude_none=True)
+    for field, value in values.items():
+        for item in value if isinstance(value, list) else [value]:
+            if _is_number(item) or _term(item) is not None:
+                yield field, item
+
+
+class _Metadata:
+    """The testMetadata fields reports are selected by, without the report."""
+    __slots__ = ("dutName", "testType", "result", "startDate")
+
+    def __init__(self, report):
+        metadata = report.testMetadata
+        start = metadata.startDate
+        self.dutName = metadata.dutName
+        self.testType = metadata.testType
+        self.result = metadata.result
+        self.startDate = start.astimezone(timezone.utc) if start.tzinfo else start.replace(tzinfo=timezone.utc)
+
+
+class _NumericColumn:
+    """Sorted (value, slot) pairs of one numeric field, for range lookups."""
+
+    def __init__(self):
+        self.entries: List[Tuple[Number, int]] = []
+
+    def add(self, value: Number, slot: int) -> None:
+        bisect.insort(self.entries, (value, slot))
+
+    def remove(self, value: Number, slot: int) -> None:
+        i = bisect.bisect_left(self.entries, (value, slot))
+        if i < len(self.entries) and self.entries[i] == (value, slot):
+            del self.entries[i]
+
+    def bitmap(self, operator: str, value: Number) -> int:
+        if operator in ("ge", "eq"):
+            lo = bisect.bisect_left(self.entries, (value, -1))
+        elif operator == "gt":
+            lo = bisect.bisect_right(self.entries, (value, float("inf")))
+        else:
+            lo = 0
+        if operator in ("le", "eq"):
+            hi = bisect.bisect_right(self.entries, (value, float("inf")))
+        elif operator == "lt":
+            hi = bisect.bisect_left(self.entries, (value, -1))
+        else:
+            hi = len(self.entries)
+        bits = 0
+        for _, slot in self.entries[lo:hi]:
+            bits |= 1 << slot
+        return bits
+
+
+class ConfigurationIndex:
+    """Inverted index of report configuration parameters.
+
+    Each report is given a dense integer slot. Enum, string and boolean
+    values (bands, frequency range, duplex mode, SCS, deployment, vendor
+    extras...) map to bitmaps of slots, stored as Python ints, and numeric
+    values (numMimoLayers, totalTransmissionBandwidth, nr-arfcn...) are kept
+    in sorted columns. A query is answered by intersecting bitmaps.
+
+    A report matches a criterion when any of its ConfigurationParameters
+    (test metadata or testbed component) satisfies it. The dutName, testType,
+    result and startDate of each report are kept too, for `select`.
+    """
+
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._all = 0
+        self._terms: Dict[Tuple[str, str], int] = {}
+        self._numeric: Dict[str, _NumericColumn] = {}
+        # What each slot contributed, so it can be removed without the report
+        self._entries: Dict[int, Set[Tuple[str, object]]] = {}
+        self._metadata: Dict[int, _Metadata] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, report_id: object) -> bool:
+        return report_id in self._slots
+
+    def add(self, report_id: str, report) -> None:
+        """Index a report, replacing any previous entry for the same id."""
+        entries = {
+            (field, value)
+            for params in iter_configuration_parameters(report)
+            for field, value in extract_fields(params)
+        }
+        metadata = _Metadata(report)
+        with self._lock:
+            self._remove(report_id)
+            slot = self._free.pop() if self._free else len(self._ids)
+            if slot == len(self._ids):
+                self._ids.append(report_id)
+            else:
+                self._ids[slot] = report_id
+            self._slots[report_id] = slot
+            self._all |= 1 << slot
+            self._entries[slot] = entries
+            self._metadata[slot] = metadata
+            for field, value in entries:
+                if _is_number(value):
+                    self._numeric.setdefault(field, _NumericColumn()).add(value, slot)
+                else:
+                    key = (field, _term(value))
+                    self._terms[key] = self._terms.get(key, 0) | (1 << slot)
+
+    def remove(self, report_id: str) -> None:
+        with self._lock:
+            self._remove(report_id)
+
+    def _remove(self, report_id: str) -> None:
+        slot = self._slots.pop(report_id, None)
+        if slot is None:
+            return
+        mask = ~(1 << slot)
+        del self._metadata[slot]
+        for field, value in self._entries.pop(slot):
+            if _is_number(value):
+                self._numeric[field].remove(value, slot)
+            else:
+                key = (field, _term(value))
+                bits = self._terms[key] & mask
+                if bits:
+                    self._terms[key] = bits
+                else:
+                    del self._terms[key]
+        self._all &= mask
+        self._ids[slot] = None
+        self._free.append(slot)
+
+    def _criterion(self, field: str, raw: str) -> int:
+        negate = raw.startswith("not:")
+        if negate:
+            raw = raw[4:]
+        operator, sep, operand = raw.partition(":")
+        if not sep or operator not in NUMERIC_OPERATORS:
+            operator, operand = "eq", raw
+
+        number = None
+        try:
+            number = float(operand)
+        except ValueError:
+            pass
+        if operator != "eq" and number is None:
+            raise QueryError(f"'{field}': operator '{operator}' needs a numeric value, got '{operand}'.")
+
+        bits = 0
+        column = self._numeric.get(field)
+        if column is not None and number is not None:
+            bits |= column.bitmap(operator, number)
+        if operator == "eq":
+            bits |= self._terms.get((field, operand), 0)
+        return self._all & ~bits if negate else bits
+
+    def query(self, criteria: List[Tuple[str, str]]) -> List[str]:
+        """Report ids matching every criterion.
+
+        `criteria` are (field, value) pairs as they appear in a query string.
+        Values of the same field are OR-ed, different fields are AND-ed.
+        Values may carry a comparison prefix (ge:, gt:, le:, lt:, eq:) and
+        a leading `not:` negates a value.
+        """
+        by_field: Dict[str, List[str]] = {}
+        for field, raw in criteria:
+            by_field.setdefault(field, []).append(raw)
+        with self._lock:
+            result = self._all
+            for field, raws in by_field.items():
+                bits = 0
+                for raw in raws:
+                    bits |= self._criterion(field, raw)
+                result &= bits
+                if not result:
+                    return []
+            ids = []
+            while result:
+                low = result & -result
+                ids.append(self._ids[low.bit_length() - 1])
+                result ^= low
+            return ids
+
+    def select(
+        self,
+        report_ids: List[str],
+        dutName: Optional[str] = None,
+        testType=None,
+        result=None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+    ) -> List[str]:
+        """The ids among `report_ids` whose test metadata matches, in order.
+
+        Criteria left as None are not checked; start_from/start_to bound the
+        startDate, inclusive and exclusive, and must be timezone-aware.
+        Reports no longer indexed are left out.
+        """
+        selected = []
+        with self._lock:
+            for report_id in report_ids:
+                slot = self._slots.get(report_id)
+                if slot is None:
+                    continue
+                metadata = self._metadata[slot]
+                if (
+                    (dutName is not None and metadata.dutName != dutName)
+                    or (testType is not None and metadata.testType != testType)
+                    or (result is not None and metadata.result != result)
+                    or (start_from is not None and metadata.startDate < start_from)
+                    or (start_to is not None and metadata.startDate >= start_to)
+                ):
+                    continue
+                selected.append(report_id)
+        return selected
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Set
+
+
+def canonical_digest(value: Any) -> bytes:
+    """SHA-256 of a decoded JSON value, independent of key order and whitespace."""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).digest()
+
+
+def raw_digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ReportDigest:
+    """Content hash of a TestReport body, kept per top-level member.
+
+    testResults, when it is an array, is hashed item by item, so that a
+    replacement can tell which members and which test results changed.
+    The digest is computed on the JSON as sent, before any validation, and
+    the same way whether the body was buffered or streamed.
+    """
+
+    __slots__ = ("members", "items", "digest", "raw")
+
+    def __init__(self, members: Dict[str, bytes], items: Optional[List[bytes]], raw: Optional[str] = None):
+        self.members = members
+        self.items = items
+        # SHA-256 of the exact bytes, which settles byte-identical re-uploads without parsing
+        self.raw = raw
+        combined = dict(members)
+        if items is not None:
+            combined["testResults"] = hashlib.sha256(b"".join(items)).digest()
+        h = hashlib.sha256()
+        for key in sorted(combined):
+            h.update(key.encode() + b"\0" + combined[key])
+        self.digest = h.hexdigest()
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> Optional["ReportDigest"]:
+        """Digest of a whole body, or None when it is not a JSON object."""
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return None
+        if not isinstance(value, dict):
+            return None
+        results = value.pop("testResults", None) if isinstance(value.get("testResults"), list) else None
+        return cls(
+            {key: canonical_digest(member) for key, member in value.items()},
+            [canonical_digest(item) for item in results] if results is not None else None,
+            raw_digest(raw),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ReportDigest) and self.digest == other.digest
+
+    def changed_members(self, new: "ReportDigest") -> Set[str]:
+        """Top-level members (testResults included) that differ in `new`."""
+        changed = {key for key in self.members.keys() | new.members.keys() if self.members.get(key) != new.members.get(key)}
+        if self.items != new.items:
+            changed.add("testResults")
+        return changed
+
+    def changed_items(self, new: "ReportDigest") -> List[int]:
+        """Positions of the testResults items of `new` that this body does not have."""
+        previous = set(self.items or ())
+        return [i for i, digest in enumerate(new.items or ()) if digest not in previous]
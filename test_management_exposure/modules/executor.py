@@ -0,0 +1,205 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from test_management_exposure.modules.content_hash import ReportDigest, canonical_digest
+from test_management_exposure.modules.test_report import TestReport
+from test_management_exposure.modules.test_result import TestCase, TestGroup
+from test_management_exposure.modules.test_specification import TestSpecification
+
+# "auto" picks inline/thread/process by body size, "inline" runs everything on the event loop.
+EXECUTOR_STRATEGY = os.environ.get("EXECUTOR_STRATEGY", "auto")
+# Bodies up to this size are cheap enough to handle on the event loop.
+EXECUTOR_INLINE_MAX_BYTES = int(os.environ.get("EXECUTOR_INLINE_MAX_BYTES", str(64 * 1024)))
+# Bodies from this size on go to the process pool; 0 disables the process pool.
+# pydantic-core holds the GIL through most of validate_json, so past this size
+# a thread still stalls the event loop noticeably.
+EXECUTOR_PROCESS_MIN_BYTES = int(os.environ.get("EXECUTOR_PROCESS_MIN_BYTES", str(1024 * 1024)))
+EXECUTOR_THREADS = int(os.environ.get("EXECUTOR_THREADS", "4"))
+EXECUTOR_PROCESSES = int(os.environ.get("EXECUTOR_PROCESSES", "2"))
+# Jobs allowed to wait per pool on top of the ones running.
+EXECUTOR_QUEUE_SIZE = int(os.environ.get("EXECUTOR_QUEUE_SIZE", "32"))
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the pool a job was routed to already has a full queue."""
+
+
+class ReportValidationFailed(Exception):
+    """Validation errors raised in a worker, converted to plain dicts so they survive pickling."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _errors(exc: ValidationError, prefix: tuple = ()) -> List[Dict[str, Any]]:
+    return [{"type": e["type"], "loc": (*prefix, *e["loc"]), "msg": e["msg"]} for e in exc.errors()]
+
+
+# --- Jobs. Module-level so that the process pool can pickle them. ---
+
+def parse_report(raw: bytes) -> TestReport:
+    try:
+        return TestReport.model_validate_json(raw)
+    except ValidationError as exc:
+        raise ReportValidationFailed(_errors(exc)) from None
+
+
+def parse_test_results(items: List[Any]) -> List[Any]:
+    """Validate patched testResults items as TestGroup when they carry groupItems, else TestCase."""
+    validated = []
+    for index, item_data in enumerate(items):
+        try:
+            if isinstance(item_data, dict) and "groupItems" in item_data:
+                validated.append(TestGroup.model_validate(item_data))
+            else:
+                validated.append(TestCase.model_validate(item_data))
+        except ValidationError as exc:
+            raise ReportValidationFailed(_errors(exc, ("testResults", index))) from None
+    return validated
+
+
+_test_result_item = TypeAdapter(Union[TestCase, TestGroup])
+_specifications = TypeAdapter(List[TestSpecification])
+
+
+def parse_test_result_item(raw: bytes, index: int) -> Tuple[Union[TestCase, TestGroup], bytes, bytes]:
+    """Validate one testResults item the way TestReport does; return it along with
+    its stored JSON form and the content digest of the JSON as sent."""
+    try:
+        item = _test_result_item.validate_json(raw)
+    except ValidationError as exc:
+        raise ReportValidationFailed(_errors(exc, ("testResults", index))) from None
+    return item, _test_result_item.dump_json(item, by_alias=True, exclude_unset=True), canonical_digest(json.loads(raw))
+
+
+def parse_specifications(raw: bytes) -> List[TestSpecification]:
+    try:
+        return _specifications.validate_json(raw)
+    except ValidationError as exc:
+        raise ReportValidationFailed(_errors(exc, ("testSpecifications",))) from None
+
+
+def digest_report(raw: bytes) -> Optional[ReportDigest]:
+    return ReportDigest.from_json(raw)
+
+
+def serialize_response(report: TestReport) -> bytes:
+    # Same output as response_model_exclude_none on the GET route
+    return report.__pydantic_serializer__.to_json(report, by_alias=True, exclude_none=True)
+
+
+class _BoundedPool:
+    def __init__(self, name: str, factory: Callable[[], Executor], workers: int, queue_size: int):
+        self.name = name
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self.limit = workers + queue_size
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.replaced = 0
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run `fn(*args)` in the pool.
+
+        A pool broken by a dead worker (e.g. one killed for running out of
+        memory) is replaced and the job retried once in the new pool.
+        """
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise ExecutorSaturated(f"{self.name} pool queue is full.")
+        self.in_flight += 1
+        try:
+            for attempt in range(2):
+                if self._executor is None:
+                    self._executor = self._factory()
+                executor = self._executor
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+                except BrokenExecutor:
+                    # Jobs failing together with this one find the pool already replaced
+                    if self._executor is executor:
+                        self._executor = None
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        self.replaced += 1
+                    if attempt:
+                        raise
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ExecutionStrategy:
+    """Runs CPU-bound validation and serialization jobs off the event loop.
+
+    Small bodies run inline, moderate ones on a thread pool and very large
+    ones on a process pool, where they do not hold the server's GIL. Each
+    pool admits a bounded number of jobs and rejects the rest with
+    ExecutorSaturated.
+    """
+
+    def __init__(
+        self,
+        strategy: str = EXECUTOR_STRATEGY,
+        inline_max_bytes: int = EXECUTOR_INLINE_MAX_BYTES,
+        process_min_bytes: int = EXECUTOR_PROCESS_MIN_BYTES,
+        threads: int = EXECUTOR_THREADS,
+        processes: int = EXECUTOR_PROCESSES,
+        queue_size: int = EXECUTOR_QUEUE_SIZE,
+    ):
+        self.strategy = strategy
+        self.inline_max_bytes = inline_max_bytes
+        self.process_min_bytes = process_min_bytes
+        self.inline_jobs = 0
+        self.threads = _BoundedPool(
+            "thread", lambda: ThreadPoolExecutor(threads, thread_name_prefix="validation"), threads, queue_size
+        )
+        # spawn, not fork: the server process already runs threads
+        self.processes = _BoundedPool(
+            "process",
+            lambda: ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")),
+            processes,
+            queue_size,
+        )
+
+    async def run(self, size: int, fn: Callable, *args, allow_process: bool = True) -> Any:
+        """Run `fn(*args)` where a job of `size` bytes belongs.
+
+        `allow_process=False` keeps jobs whose arguments are expensive to
+        pickle (e.g. model instances) out of the process pool.
+        """
+        if self.strategy == "inline" or size <= self.inline_max_bytes:
+            self.inline_jobs += 1
+            return fn(*args)
+        if allow_process and self.process_min_bytes and size >= self.process_min_bytes:
+            return await self.processes.run(fn, *args)
+        return await self.threads.run(fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "inlineJobs": self.inline_jobs,
+            **{
+                pool.name: {
+                    "inFlight": pool.in_flight, "limit": pool.limit, "completed": pool.completed,
+                    "rejected": pool.rejected, "replaced": pool.replaced,
+                }
+                for pool in (self.threads, self.processes)
+            },
+        }
+
+    def shutdown(self) -> None:
+        self.threads.shutdown()
+        self.processes.shutdown()
@@ -0,0 +1,397 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from test_management_exposure.modules.retention import compacted_measurements
+from test_management_exposure.modules.test_result import ResultType, iter_test_cases
+from test_management_exposure.modules.test_specification import ConditionEnum, ExpectationTargetRequest
+
+# Compiled expectation targets kept for reuse, least recently used dropped first.
+EXPECTATION_MAX_COMPILED_TARGETS = int(os.environ.get("EXPECTATION_MAX_COMPILED_TARGETS", "4096"))
+
+# --- Units ---
+
+_UNIT_ALIASES = {
+    "%": "percentage", "percent": "percentage", "percentage": "percentage",
+    "ms": "millisecond", "millisecond": "millisecond", "milliseconds": "millisecond",
+    "s": "second", "sec": "second", "second": "second", "seconds": "second",
+    "bps": "bps", "bit/s": "bps", "kbps": "kbps", "kbit/s": "kbps",
+    "mbps": "Mbps", "mbit/s": "Mbps", "gbps": "Gbps", "gbit/s": "Gbps",
+    "w": "W", "watt": "W", "mw": "mW", "dbm": "dBm", "db": "dB",
+    "bps/hz": "bps/Hz", "count": "count", "boolean": "boolean", "text": "text",
+}
+
+# Units convertible by a scale factor to a common base unit
+_LINEAR_UNITS = {
+    "bps": ("rate", 1.0), "kbps": ("rate", 1e3), "Mbps": ("rate", 1e6), "Gbps": ("rate", 1e9),
+    "millisecond": ("time", 1e-3), "second": ("time", 1.0),
+    "W": ("power", 1.0), "mW": ("power", 1e-3),
+}
+
+
+class UnitMismatch(ValueError):
+    """Raised when a target unit cannot be converted to a measurement unit."""
+
+
+def normalize_unit(unit: Optional[str]) -> Optional[str]:
+    if unit is None:
+        return None
+    unit = getattr(unit, "value", unit)
+    return _UNIT_ALIASES.get(unit.strip().lower(), unit.strip())
+
+
+def _to_watt(value: float, unit: str) -> float:
+    if unit == "dBm":
+        return 10 ** ((value - 30) / 10)
+    return value * _LINEAR_UNITS[unit][1]
+
+
+def unit_converter(from_unit: Optional[str], to_unit: Optional[str]) -> Callable[[float], float]:
+    """Function converting a number from `from_unit` to `to_unit`."""
+    if from_unit is None or to_unit is None or from_unit == to_unit:
+        return lambda value: value
+    power_units = ("W", "mW", "dBm")
+    if from_unit in power_units and to_unit in power_units:
+        if to_unit == "dBm":
+            return lambda value: 10 * math.log10(_to_watt(value, from_unit)) + 30
+        return lambda value: _to_watt(value, from_unit) / _LINEAR_UNITS[to_unit][1]
+    src, dst = _LINEAR_UNITS.get(from_unit), _LINEAR_UNITS.get(to_unit)
+    if src is None or dst is None or src[0] != dst[0]:
+        raise UnitMismatch(f"Cannot convert '{from_unit}' to '{to_unit}'.")
+    factor = src[1] / dst[1]
+    return lambda value: value * factor
+
+
+# --- Compiled targets ---
+
+def _operands(value_range) -> list:
+    """targetValueRange as a flat list: a scalar, a list, "a,b" or {"min": a, "max": b}.
+
+    Raises ValueError for an object that is not such a range.
+    """
+    if isinstance(value_range, dict):
+        if not value_range or set(value_range) - {"min", "max"}:
+            raise ValueError("targetValueRange object needs 'min' and/or 'max' and nothing else.")
+        return [value_range.get("min", -math.inf), value_range.get("max", math.inf)]
+    if isinstance(value_range, str):
+        items = [v.strip() for v in value_range.split(",")] if "," in value_range else [value_range]
+    elif isinstance(value_range, list):
+        items = value_range
+    else:
+        items = [value_range]
+    operands = []
+    for item in items:
+        if isinstance(item, str):
+            try:
+                item = float(item)
+            except ValueError:
+                pass
+        operands.append(item)
+    return operands
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Per condition: (whole-array check, per-element check). The whole-array
+# check runs on C-level builtins and the element check is only used to
+# count violations once the array is known to fail.
+def _ordering(condition: ConditionEnum, ops: list):
+    t = ops[0]
+    if condition == ConditionEnum.IS_LESS_THAN:
+        return (lambda vs: max(vs) < t), (lambda v: v < t)
+    if condition == ConditionEnum.IS_GREATER_THAN:
+        return (lambda vs: min(vs) > t), (lambda v: v > t)
+    if condition in (ConditionEnum.IS_EQUAL_TO_OR_LESS_THAN, ConditionEnum.IS_LESS_THAN_OR_EQUAL_TO):
+        return (lambda vs: max(vs) <= t), (lambda v: v <= t)
+    if condition in (ConditionEnum.IS_EQUAL_TO_OR_GREATER_THAN, ConditionEnum.IS_GREATER_THAN_OR_EQUAL_TO):
+        return (lambda vs: min(vs) >= t), (lambda v: v >= t)
+    lo, hi = (ops[0], ops[1]) if len(ops) > 1 else (-math.inf, ops[0])
+    if condition == ConditionEnum.IS_WITHIN_RANGE:
+        return (lambda vs: lo <= min(vs) and max(vs) <= hi), (lambda v: lo <= v <= hi)
+    # IS_OUTSIDE_RANGE / IS_NOT_WITHIN
+    return None, (lambda v: v < lo or v > hi)
+
+
+_ORDERING_CONDITIONS = {
+    ConditionEnum.IS_LESS_THAN, ConditionEnum.IS_GREATER_THAN,
+    ConditionEnum.IS_EQUAL_TO_OR_LESS_THAN, ConditionEnum.IS_LESS_THAN_OR_EQUAL_TO,
+    ConditionEnum.IS_EQUAL_TO_OR_GREATER_THAN, ConditionEnum.IS_GREATER_THAN_OR_EQUAL_TO,
+    ConditionEnum.IS_WITHIN_RANGE, ConditionEnum.IS_OUTSIDE_RANGE, ConditionEnum.IS_NOT_WITHIN,
+}
+
+# (passed, violations, detail)
+Outcome = Tuple[bool, int, Optional[str]]
+
+
+class CompiledTarget:
+    """An ExpectationTargetRequest turned into a predicate over measurement value arrays.
+
+    Numeric operands are converted once per measurement unit, so the
+    values themselves are never converted.
+    """
+
+    def __init__(self, target: ExpectationTargetRequest):
+        self.name = target.targetName
+        self.condition = target.targetCondition
+        self.unit = normalize_unit(target.targetUnit)
+        self.invalid: Optional[str] = None
+        try:
+            self.operands = _operands(target.targetValueRange)
+        except ValueError as exc:
+            self.operands, self.invalid = [], str(exc)
+        self._by_unit: Dict[Optional[str], Callable[[list], Outcome]] = {}
+
+    def predicate(self, unit: Optional[str]) -> Callable[[list], Outcome]:
+        unit = normalize_unit(unit)
+        if unit not in self._by_unit:
+            self._by_unit[unit] = self._compile(unit)
+        return self._by_unit[unit]
+
+    def _compile(self, unit: Optional[str]) -> Callable[[list], Outcome]:
+        if self.invalid:
+            invalid = self.invalid
+            return lambda values: (False, 0, invalid)
+        try:
+            convert = unit_converter(self.unit, unit)
+        except UnitMismatch as exc:
+            reason = str(exc)
+            return lambda values: (False, 0, reason)
+        ops = [convert(op) if _is_number(op) else op for op in self.operands]
+        condition = self.condition
+
+        if condition in _ORDERING_CONDITIONS:
+            if not ops or not all(_is_number(op) for op in ops):
+                return lambda values: (False, 0, f"{condition.value} needs numeric targetValueRange.")
+            fast, element = _ordering(condition, ops)
+
+            def evaluate(values: list) -> Outcome:
+                try:
+                    if fast is not None and fast(values):
+                        return True, 0, None
+                    violations = sum(1 for v in values if not element(v))
+                except TypeError:
+                    return False, len(values), "Non-numeric measurement values."
+                return violations == 0, violations, None
+            return evaluate
+
+        try:
+            operand_set = set(ops)
+        except TypeError:
+            return lambda values: (False, 0, f"{condition.value} needs scalar targetValueRange values.")
+        if condition == ConditionEnum.IS_EQUAL_TO:
+            return lambda values: _members(values, lambda s: s <= operand_set, lambda v: v in operand_set)
+        if condition == ConditionEnum.IS_NOT_EQUAL_TO:
+            return lambda values: _members(values, operand_set.isdisjoint, lambda v: v not in operand_set)
+        if condition == ConditionEnum.IS_ONE_OF:
+            return lambda values: _members(values, lambda s: s <= operand_set, lambda v: v in operand_set)
+        if condition == ConditionEnum.IS_NOT_ONE_OF:
+            return lambda values: _members(values, operand_set.isdisjoint, lambda v: v not in operand_set)
+        if condition == ConditionEnum.IS_ALL_OF:
+            return lambda values: (operand_set <= set(values), 0, None)
+        # IS_NOT_ALL_OF
+        return lambda values: (not operand_set <= set(values), 0, None)
+
+
+def _members(values: list, fast: Callable[[set], bool], element: Callable[[object], bool]) -> Outcome:
+    if fast(set(values)):
+        return True, 0, None
+    return False, sum(1 for v in values if not element(v)), None
+
+
+def _target_key(target: ExpectationTargetRequest) -> str:
+    return json.dumps(
+        [target.targetName, target.targetCondition.value, target.targetValueRange, target.targetUnit],
+        sort_keys=True, default=str,
+    )
+
+
+# --- Results ---
+
+class MeasurementEvaluation(BaseModel):
+    """Outcome of one expectation target against one recorded measurement."""
+    testCase: str = Field(..., description="Number of the test case holding the measurement.")
+    metric: Optional[int] = Field(None, description="Index of the metric within the test case, or None for test case measurements.")
+    measurement: str = Field(..., description="Name of the measurement.")
+    targetName: str
+    targetCondition: ConditionEnum
+    result: ResultType
+    violations: int = Field(0, description="Number of values not meeting the target.")
+    detail: Optional[str] = None
+
+
+class MetricEvaluation(BaseModel):
+    """Metric result derived from its measurements, next to the one reported by the harness."""
+    testCase: str
+    metric: int
+    description: str
+    reportedResult: ResultType
+    evaluatedResult: ResultType
+
+
+class ReportEvaluation(BaseModel):
+    testId: str
+    result: ResultType
+    measurements: List[MeasurementEvaluation]
+    metrics: List[MetricEvaluation]
+
+
+def _aggregate(results: Iterable[ResultType]) -> ResultType:
+    results = set(results)
+    if ResultType.FAIL in results:
+        return ResultType.FAIL
+    if ResultType.PASS in results:
+        return ResultType.PASS
+    return ResultType.SKIP
+
+
+class _CaseEvaluation:
+    def __init__(self, measurements: List[MeasurementEvaluation], metrics: List[MetricEvaluation]):
+        self.measurements = measurements
+        self.metrics = metrics
+
+
+class ExpectationEngine:
+    """Evaluates the expectation targets of each report's test specifications
+    against the measurements recorded in its test results.
+
+    Targets are compiled once and shared between reports, up to
+    `max_compiled` of them. Results are kept per test case so that a PATCH
+    only re-evaluates the cases it carries, along with the report version
+    they were computed for; `versions(report_id)` gives the current version
+    of a report. Results of a version that is no longer current are neither
+    kept nor served. Measurements whose values retention reduced to a summary
+    are not evaluated: their targets are SKIPped with a detail saying so.
+    """
+
+    def __init__(self, versions: Callable[[str], int], max_compiled: int = EXPECTATION_MAX_COMPILED_TARGETS):
+        self._versions = versions
+        self.max_compiled = max_compiled
+        self._compiled: "OrderedDict[str, CompiledTarget]" = OrderedDict()
+        # report id -> (version, results per test case number)
+        self._cases: Dict[str, Tuple[int, Dict[str, _CaseEvaluation]]] = {}
+        self._lock = threading.Lock()
+
+    def compile(self, target: ExpectationTargetRequest) -> CompiledTarget:
+        key = _target_key(target)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+        compiled = CompiledTarget(target)
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_compiled:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def _targets(self, specifications) -> Dict[str, List[CompiledTarget]]:
+        by_name: Dict[str, List[CompiledTarget]] = {}
+        for specification in specifications:
+            for target in specification.expectationTargets:
+                compiled = self.compile(target)
+                by_name.setdefault(compiled.name, []).append(compiled)
+        return by_name
+
+    def _evaluate_case(self, targets: Dict[str, List[CompiledTarget]], case) -> _CaseEvaluation:
+        measurements, metrics = [], []
+
+        compacted = compacted_measurements(case)
+
+        def run(measurement, metric_index, position) -> List[ResultType]:
+            results = []
+            for target in targets.get(measurement.name, ()):
+                if (metric_index, position) in compacted:
+                    # Only a summary of the values is left: their mean would be evaluated, not the values
+                    result, violations, detail = ResultType.SKIP, 0, "Measurement values were compacted by retention."
+                else:
+                    passed, violations, detail = target.predicate(measurement.units)(measurement.values)
+                    result = ResultType.SKIP if detail and not violations else (ResultType.PASS if passed else ResultType.FAIL)
+                results.append(result)
+                measurements.append(MeasurementEvaluation(
+                    testCase=case.number, metric=metric_index, measurement=measurement.name,
+                    targetName=target.name, targetCondition=target.condition,
+                    result=result, violations=violations, detail=detail,
+                ))
+            return results
+
+        for index, metric in enumerate(case.metrics):
+            results = [r for position, m in enumerate(metric.measurements) for r in run(m, index, position)]
+            metrics.append(MetricEvaluation(
+                testCase=case.number, metric=index, description=metric.description,
+                reportedResult=metric.result, evaluatedResult=_aggregate(results),
+            ))
+        for position, measurement in enumerate(case.measurements or []):
+            run(measurement, None, position)
+        return _CaseEvaluation(measurements, metrics)
+
+    def evaluate(self, report_id: str, report, version: int, cases: Optional[Iterable] = None) -> Dict[str, _CaseEvaluation]:
+        """(Re-)evaluate version `version` of a report and return its results.
+
+        With `cases`, only those test cases are evaluated and cases no longer
+        present in the report are dropped; otherwise, or when the report has
+        no results yet, every case is.
+        """
+        targets = self._targets(report.testSpecifications)
+        current = {case.number: case for case in iter_test_cases(report.testResults)}
+        with self._lock:
+            previous = self._cases.get(report_id) if cases is not None else None
+        if previous is None:
+            # Nothing to build on: evaluate every case
+            cases, previous = None, (version, {})
+        evaluated = {number: previous[1][number] for number in current if number in previous[1]}
+        for case in (iter_test_cases(cases) if cases is not None else current.values()):
+            evaluated[case.number] = self._evaluate_case(targets, case)
+        self.record(report_id, evaluated, version)
+        return evaluated
+
+    def evaluate_cases(self, specifications, cases: Iterable) -> Dict[str, _CaseEvaluation]:
+        """Evaluate test cases without recording anything, for reports that arrive piecewise; see `record`."""
+        targets = self._targets(specifications)
+        return {case.number: self._evaluate_case(targets, case) for case in iter_test_cases(cases)}
+
+    def record(self, report_id: str, evaluated: Dict[str, _CaseEvaluation], version: int) -> None:
+        """Replace the results of a report with cases evaluated for `version`, if that is still its current version."""
+        with self._lock:
+            # Checked under the lock, so an evaluation finishing late never replaces a newer one
+            if self._versions(report_id) == version:
+                self._cases[report_id] = (version, evaluated)
+
+    def cached_result(self, report_id: str) -> Optional[ReportEvaluation]:
+        """The result of a report when its current version is already evaluated, without needing the report."""
+        with self._lock:
+            entry = self._cases.get(report_id)
+            if entry is None or entry[0] != self._versions(report_id):
+                return None
+        return self._summarize(report_id, entry[1])
+
+    def result(self, report_id: str, report, version: int) -> ReportEvaluation:
+        """The result of version `version` of a report, evaluating it unless it already is."""
+        with self._lock:
+            entry = self._cases.get(report_id)
+        if entry is not None and entry[0] == version:
+            evaluated = entry[1]
+        else:
+            evaluated = self.evaluate(report_id, report, version)
+        return self._summarize(report_id, evaluated)
+
+    def _summarize(self, report_id: str, evaluated: Dict[str, _CaseEvaluation]) -> ReportEvaluation:
+        measurements = [m for case in evaluated.values() for m in case.measurements]
+        metrics = [m for case in evaluated.values() for m in case.metrics]
+        return ReportEvaluation(
+            testId=report_id,
+            result=_aggregate(m.result for m in measurements),
+            measurements=measurements,
+            metrics=metrics,
+        )
+
+    def forget(self, report_id: str) -> None:
+        with self._lock:
+            self._cases.pop(report_id, None)
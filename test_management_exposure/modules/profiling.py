@@ -0,0 +1,344 @@
+import cProfile
+import fnmatch
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+# Allow clients to profile a single request with the X-Profile header.
+PROFILE_HEADER_ENABLED = os.environ.get("PROFILE_HEADER_ENABLED", "false").lower() == "true"
+# Interval in seconds of the always-on sampler; 0 disables it.
+PROFILE_CONTINUOUS_INTERVAL = float(os.environ.get("PROFILE_CONTINUOUS_INTERVAL", "0"))
+# Upper bound on distinct stacks kept by a sampler, to bound its memory.
+PROFILE_MAX_STACKS = int(os.environ.get("PROFILE_MAX_STACKS", "20000"))
+# Completed captures kept for retrieval before the oldest are dropped.
+PROFILE_MAX_CAPTURES = int(os.environ.get("PROFILE_MAX_CAPTURES", "100"))
+
+_MODULES_DIR = os.path.dirname(os.path.abspath(__file__))
+_TRUNCATED = "[truncated]"
+# Frames of these files at the top of a stack mean the thread is parked, e.g. an idle pool worker
+_IDLE_FILES = {"threading.py", "queue.py", "selectors.py"}
+
+
+class ProfileMode(str, Enum):
+    """How requests are profiled.
+
+    cProfile only sees the event loop thread: work handed to the threadpool
+    or the process pool (validation, serialization, rehydration) is missing
+    from its output. Sample mode also samples busy threadpool threads.
+    """
+    SAMPLE = "sample"      # statistical stack sampling, collapsed-stack output
+    CPROFILE = "cprofile"  # deterministic cProfile of the event loop thread, pstats output
+
+
+class ProfileCaptureRequest(BaseModel):
+    """Arms a profile capture for the next matching requests."""
+    method: str = Field("PUT", description="HTTP method of the requests to capture.")
+    path: str = Field(..., description="Request path to capture, shell-style wildcards allowed (e.g. /ProvMnS/v1alpha1/SubNetwork/*).")
+    requests: int = Field(1, ge=1, le=1000, description="Number of matching requests to capture.")
+    mode: ProfileMode = Field(
+        ProfileMode.SAMPLE,
+        description="Profiling mode. cprofile only sees the event loop, not work done in the threadpool or process pool.",
+    )
+    interval: float = Field(0.001, ge=0.0001, le=1.0, description="Sampling interval in seconds (sample mode only).")
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_MODULES_DIR):
+        filename = "modules/" + os.path.relpath(filename, _MODULES_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _model_name(obj) -> Optional[str]:
+    """Name of the modules/ pydantic model `obj` is, is an instance of, or validates."""
+    # FastAPI validates request bodies through a field wrapper holding the model annotation
+    annotation = getattr(getattr(obj, "field_info", None), "annotation", None)
+    if annotation is not None:
+        obj = annotation
+    cls = obj if isinstance(obj, type) else type(obj)
+    if issubclass(cls, BaseModel) and cls.__module__.startswith(__package__ + "."):
+        return cls.__name__
+    return None
+
+
+def _attribute_model(frame) -> Optional[str]:
+    """Innermost modules/ pydantic model the sampled stack is working on, if any."""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(_MODULES_DIR) and "." in code.co_qualname:
+            # Methods and validators defined on a model class
+            owner = frame.f_globals.get(code.co_qualname.split(".", 1)[0])
+            model = _model_name(owner) if isinstance(owner, type) else None
+            if model:
+                return model
+        local_vars = frame.f_locals
+        for name in ("cls", "self"):
+            if name in local_vars:
+                model = _model_name(local_vars[name])
+                if model:
+                    return model
+        frame = frame.f_back
+    return None
+
+
+def _is_idle(frame) -> bool:
+    """Whether a thread is blocked waiting for work rather than running."""
+    return os.path.basename(frame.f_code.co_filename) in _IDLE_FILES
+
+
+class StackSampler:
+    """Samples thread stacks at a fixed interval from a background thread.
+
+    The target thread (the event loop) is sampled on every tick, other
+    threads such as the validation pool only while they are not idle, so
+    work moved off the loop is still seen. Work done in the process pool is
+    not. Stacks are aggregated into flamegraph-compatible collapsed form,
+    rooted at the thread name, and the time is also attributed to the
+    innermost `modules/` pydantic model being validated or executed.
+    """
+
+    def __init__(self, interval: float, max_stacks: int = PROFILE_MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.target_ident: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.models: Counter = Counter()
+        self.samples = 0
+        self.overhead_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self._paused = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, target_ident: int) -> None:
+        self.target_ident = target_ident
+        if self._thread is None:
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def pause(self) -> None:
+        self._paused.set()
+
+    def resume(self) -> None:
+        self._paused.clear()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if not self._paused.is_set():
+                self.sample()
+
+    def sample(self) -> None:
+        started = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (ident != self.target_ident and _is_idle(frame)):
+                continue
+            labels = []
+            top = frame
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, "thread").replace(";", ":"))
+            stack = ";".join(reversed(labels))
+            if stack not in self.stacks and len(self.stacks) >= self.max_stacks:
+                stack = _TRUNCATED
+            self.stacks[stack] += 1
+            self.models[_attribute_model(top) or "other"] += 1
+        self.samples += 1
+        self.overhead_seconds += time.perf_counter() - started
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict:
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "interval": self.interval,
+            "samples": self.samples,
+            # Estimated thread-seconds spent per modules/ model
+            "modelSeconds": {name: count * self.interval for name, count in self.models.most_common()},
+            "overheadRatio": self.overhead_seconds / elapsed if elapsed else None,
+        }
+
+
+class ProfileCapture:
+    """Profiles the next `requests` requests matching a method and path pattern."""
+
+    def __init__(self, spec: ProfileCaptureRequest):
+        self.id = str(uuid.uuid4())
+        self.method = spec.method.upper()
+        self.path = spec.path
+        self.mode = spec.mode
+        self.remaining = spec.requests
+        self.completed = 0
+        self.total = spec.requests
+        self._active = 0
+        self._sampler = StackSampler(spec.interval) if spec.mode == ProfileMode.SAMPLE else None
+        self._profile = cProfile.Profile() if spec.mode == ProfileMode.CPROFILE else None
+
+    @property
+    def done(self) -> bool:
+        return self.completed >= self.total
+
+    def matches(self, method: str, path: str) -> bool:
+        return self.remaining > 0 and method == self.method and fnmatch.fnmatchcase(path, self.path)
+
+    def enter(self) -> None:
+        # Requests overlapping on the event loop share one profiling window
+        self.remaining -= 1
+        self._active += 1
+        if self._active > 1:
+            return
+        if self._sampler is not None:
+            self._sampler.start(threading.get_ident())
+            self._sampler.resume()
+        else:
+            self._profile.enable()
+
+    def exit(self) -> None:
+        self._active -= 1
+        self.completed += 1
+        if self._active > 0:
+            return
+        if self._sampler is not None:
+            self._sampler.pause()
+            if self.done:
+                self._sampler.stop()
+        else:
+            self._profile.disable()
+
+    def dump(self) -> str:
+        if self._sampler is not None:
+            return self._sampler.collapsed()
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(100)
+        return out.getvalue()
+
+    def status(self) -> Dict:
+        status = {
+            "captureId": self.id,
+            "method": self.method,
+            "path": self.path,
+            "mode": self.mode.value,
+            "completed": self.completed,
+            "requests": self.total,
+        }
+        if self._sampler is not None:
+            status.update(self._sampler.summary())
+        return status
+
+
+class Profiler:
+    """Registry of armed captures plus the optional always-on sampler."""
+
+    def __init__(self, continuous_interval: float = PROFILE_CONTINUOUS_INTERVAL):
+        self.captures: Dict[str, ProfileCapture] = {}
+        self.continuous = StackSampler(continuous_interval) if continuous_interval > 0 else None
+        # Captures still waiting for requests
+        self._armed: List[ProfileCapture] = []
+
+    def arm(self, spec: ProfileCaptureRequest) -> ProfileCapture:
+        capture = ProfileCapture(spec)
+        self.captures[capture.id] = capture
+        self._armed.append(capture)
+        done = [capture_id for capture_id, c in self.captures.items() if c.done]
+        for capture_id in done[:max(len(done) - PROFILE_MAX_CAPTURES, 0)]:
+            del self.captures[capture_id]
+        return capture
+
+    def match(self, method: str, path: str) -> Optional[ProfileCapture]:
+        if not self._armed:
+            return None
+        self._armed = [capture for capture in self._armed if capture.remaining > 0]
+        for capture in self._armed:
+            if capture.matches(method, path):
+                return capture
+        return None
+
+    def pending(self) -> List[Dict]:
+        return [c.status() for c in self.captures.values() if not c.done]
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running requests selected by an armed capture (or the
+    X-Profile header) under the profiler.
+
+    Requests pass straight through while nothing is armed and the header is
+    disabled. A capture ends once the last body chunk of the response is
+    sent, so streamed response bodies are profiled too.
+    """
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self.profiler.continuous is not None:
+            self.profiler.continuous.start(threading.get_ident())
+        capture = self.profiler.match(scope["method"], scope["path"])
+        if capture is None and PROFILE_HEADER_ENABLED:
+            header_mode = next((value for name, value in scope["headers"] if name == b"x-profile"), None)
+            if header_mode:
+                try:
+                    capture = self.profiler.arm(ProfileCaptureRequest(
+                        method=scope["method"], path=scope["path"], mode=header_mode.decode("latin-1"),
+                    ))
+                except ValidationError as exc:
+                    return await _reply(send, 400, [
+                        {"type": e["type"], "loc": ".".join(str(x) for x in e["loc"]), "msg": e["msg"]} for e in exc.errors()
+                    ])
+        if capture is None:
+            return await self.app(scope, receive, send)
+
+        capture.enter()
+        profiling = True
+
+        async def capturing_send(message):
+            nonlocal profiling
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-capture", capture.id.encode())]}
+            try:
+                await send(message)
+            finally:
+                if profiling and message["type"] == "http.response.body" and not message.get("more_body", False):
+                    profiling = False
+                    capture.exit()
+
+        try:
+            await self.app(scope, receive, capturing_send)
+        finally:
+            if profiling:
+                profiling = False
+                capture.exit()
+
+
+async def _reply(send, status_code: int, detail) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+profiler = Profiler()
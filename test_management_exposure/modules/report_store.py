@@ -0,0 +1,359 @@
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, MutableMapping, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from test_management_exposure.modules.test_report import TestReport
+
+# Memory budget of the in-memory (hot) tier in bytes of serialized report; 0 disables eviction.
+STORE_MEMORY_BUDGET = int(os.environ.get("REPORT_STORE_MEMORY_BUDGET", "0"))
+STORE_COLD_DIR = os.environ.get("REPORT_STORE_COLD_DIR", "./report_store_cold")
+
+_COLD_SUFFIX = ".json.z"
+
+
+def serialize_report(report: TestReport) -> bytes:
+    """JSON form of a report that validates back into an equal TestReport.
+
+    Only fields that were actually set are written, since some validators
+    (e.g. ExpectationObjectFragment) look at which keys are present.
+    """
+    return report.__pydantic_serializer__.to_json(report, by_alias=True, exclude_unset=True)
+
+
+class ColdWriter:
+    """Compresses a report's JSON into a cold-tier file as it is produced."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self._fh = open(path, "wb")
+        self._compressor = zlib.compressobj(6)
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        self._fh.write(self._compressor.compress(data))
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.write(self._compressor.flush())
+            self._fh.close()
+
+    def discard(self) -> None:
+        self._fh.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ReportStore(MutableMapping[str, TestReport]):
+    """Dict-like storage of TestReport objects with a memory-capped hot tier.
+
+    Reports are kept materialized in memory in LRU order. When the serialized
+    size of the hot tier exceeds the memory budget, the least recently used
+    reports are compressed to the cold tier on local disk and are rehydrated
+    transparently the next time they are read. The cold tier is a spill area
+    for this process only; it is cleared on start-up.
+    """
+
+    def __init__(self, memory_budget: int = STORE_MEMORY_BUDGET, cold_dir: str = STORE_COLD_DIR):
+        self.memory_budget = memory_budget
+        self.cold_dir = cold_dir
+        self._hot: "OrderedDict[str, TestReport]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._hot_bytes = 0
+        self._cold: Dict[str, str] = {}
+        self._versions: Dict[str, int] = {}
+        # Store-wide write counter that versions are drawn from, so that a
+        # report deleted and created again never repeats a version
+        self._clock = 0
+        # Temporary files of reports being streamed into the cold tier
+        self._spooling: Set[str] = set()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rehydrations = 0
+        self.rehydration_seconds_total = 0.0
+        self.rehydration_seconds_max = 0.0
+
+        if os.path.isdir(cold_dir):
+            for name in os.listdir(cold_dir):
+                if name.endswith(_COLD_SUFFIX):
+                    os.remove(os.path.join(cold_dir, name))
+
+    # --- Mapping interface ---
+
+    def __getitem__(self, report_id: str) -> TestReport:
+        with self._lock:
+            report = self._hit(report_id)
+            if report is not None:
+                return report
+            if report_id not in self._cold:
+                raise KeyError(report_id)
+            self.misses += 1
+            version = self.version(report_id)
+            compressed = self._read_cold(report_id)
+        # Decoded outside the lock, which readers and writers on the event loop wait for
+        started = time.perf_counter()
+        raw = zlib.decompress(compressed)
+        report = TestReport.model_validate_json(raw)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.rehydrations += 1
+            self.rehydration_seconds_total += elapsed
+            self.rehydration_seconds_max = max(self.rehydration_seconds_max, elapsed)
+            current = self._hot.get(report_id)
+            if current is not None:
+                return current  # rehydrated or written meanwhile
+            if report_id in self._cold and self.version(report_id) == version:
+                self._drop_cold(report_id)
+                self._put_hot(report_id, report, len(raw))
+        self.evict()
+        return report
+
+    async def aget(self, report_id: str) -> TestReport:
+        """`store[report_id]` for the event loop: a cold report is rehydrated in the threadpool."""
+        with self._lock:
+            report = self._hit(report_id)
+        if report is not None:
+            return report
+        return await run_in_threadpool(self.__getitem__, report_id)
+
+    def __setitem__(self, report_id: str, report: TestReport) -> None:
+        self.put(report_id, report)
+
+    def put(
+        self, report_id: str, report: TestReport, size: Optional[int] = None, promote: bool = True,
+        if_version: Optional[int] = None, evict: bool = True,
+    ) -> bool:
+        """Store a report. `size` is its serialized size when the caller already knows it.
+
+        With `promote=False` a report that is currently cold is rewritten in
+        the cold tier instead of being moved to the hot tier. With
+        `if_version`, the report is only stored if its version is still that
+        one; returns whether it was stored. With `evict=False` the hot tier
+        may stay over budget until the next `evict`.
+        """
+        if not promote and report_id in self._cold:
+            # Compressed and written before taking the lock, which readers on the event loop wait for
+            spooled = self._spool(report_id, zlib.compress(serialize_report(report), 6))
+            with self._lock:
+                if report_id in self._cold:
+                    if if_version is not None and self.version(report_id) != if_version:
+                        self._unspool(spooled)
+                        return False
+                    self._install_cold(report_id, spooled)
+                    self._bump_version(report_id)
+                    return True
+                self._unspool(spooled)
+        if size is None:
+            size = len(serialize_report(report))
+        with self._lock:
+            if if_version is not None and self.version(report_id) != if_version:
+                return False
+            self._drop_cold(report_id)
+            self._put_hot(report_id, report, size)
+            self._bump_version(report_id)
+        if evict:
+            self.evict()
+        return True
+
+    async def aput(
+        self, report_id: str, report: TestReport, size: Optional[int] = None, if_version: Optional[int] = None,
+    ) -> bool:
+        """`put` for the event loop: reports pushed out of the hot tier are spilled in the threadpool."""
+        stored = self.put(report_id, report, size, if_version=if_version, evict=False)
+        await self.aevict()
+        return stored
+
+    def __delitem__(self, report_id: str) -> None:
+        with self._lock:
+            self._versions.pop(report_id, None)
+            if report_id in self._hot:
+                del self._hot[report_id]
+                self._hot_bytes -= self._sizes.pop(report_id)
+            elif report_id in self._cold:
+                self._drop_cold(report_id)
+            else:
+                raise KeyError(report_id)
+
+    def __contains__(self, report_id: object) -> bool:
+        # Membership never rehydrates a cold report
+        return report_id in self._hot or report_id in self._cold
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = list(self._hot) + list(self._cold)
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._hot) + len(self._cold)
+
+    def peek(self, report_id: str) -> TestReport:
+        """Read a report without promoting it to the hot tier or counting the access."""
+        with self._lock:
+            report = self._hot.get(report_id)
+            if report is not None:
+                return report
+            compressed = self._read_cold(report_id)
+        # Decoded outside the lock, which readers and writers on the event loop wait for
+        return TestReport.model_validate_json(zlib.decompress(compressed))
+
+    def is_hot(self, report_id: str) -> bool:
+        return report_id in self._hot
+
+    def version(self, report_id: str) -> int:
+        """Version of a report, 0 when absent. It increases on every write and is never reused, across deletes too."""
+        return self._versions.get(report_id, 0)
+
+    def _bump_version(self, report_id: str) -> None:
+        self._clock += 1
+        self._versions[report_id] = self._clock
+
+    def size_of(self, report_id: str) -> int:
+        """Serialized size of a hot report, 0 when unknown."""
+        return self._sizes.get(report_id, 0)
+
+    # --- Tiering ---
+
+    def _hit(self, report_id: str) -> Optional[TestReport]:
+        report = self._hot.get(report_id)
+        if report is not None:
+            self.hits += 1
+            self._hot.move_to_end(report_id)
+        return report
+
+    def _put_hot(self, report_id: str, report: TestReport, size: int) -> None:
+        if report_id in self._hot:
+            self._hot_bytes -= self._sizes[report_id]
+        self._hot[report_id] = report
+        self._hot.move_to_end(report_id)
+        self._sizes[report_id] = size
+        self._hot_bytes += size
+
+    def _over_budget(self) -> bool:
+        # Always keep the most recently used report, even if it alone exceeds the budget
+        return bool(self.memory_budget) and self._hot_bytes > self.memory_budget and len(self._hot) > 1
+
+    def evict(self) -> None:
+        """Spill least recently used reports to the cold tier until the hot tier fits the memory budget.
+
+        Each report is serialized, compressed and written outside the lock;
+        one that is written meanwhile stays in the hot tier.
+        """
+        while True:
+            with self._lock:
+                if not self._over_budget():
+                    return
+                report_id, report = next(iter(self._hot.items()))
+            spooled = self._spool(report_id, zlib.compress(serialize_report(report), 6))
+            with self._lock:
+                if self._hot.get(report_id) is not report or not self._over_budget():
+                    self._unspool(spooled)
+                    continue
+                del self._hot[report_id]
+                self._hot_bytes -= self._sizes.pop(report_id)
+                self._install_cold(report_id, spooled)
+                self.evictions += 1
+
+    async def aevict(self) -> None:
+        """`evict` for the event loop, run in the threadpool when there is anything to spill."""
+        if self._over_budget():
+            await run_in_threadpool(self.evict)
+
+    def _cold_path(self, report_id: str) -> str:
+        # Hashed, so that every id maps to its own file inside cold_dir
+        return os.path.join(self.cold_dir, hashlib.sha256(report_id.encode()).hexdigest() + _COLD_SUFFIX)
+
+    def _read_cold(self, report_id: str) -> bytes:
+        with open(self._cold[report_id], "rb") as fh:
+            return fh.read()
+
+    def _spool(self, report_id: str, compressed: bytes) -> str:
+        """Write a compressed report to a temporary cold-tier file, without holding the lock; see `_install_cold`."""
+        os.makedirs(self.cold_dir, exist_ok=True)
+        path = f"{self._cold_path(report_id)}.{os.urandom(4).hex()}.tmp"
+        with self._lock:
+            self._spooling.add(path)
+        with open(path, "wb") as fh:
+            fh.write(compressed)
+        return path
+
+    def _unspool(self, path: str) -> None:
+        self._spooling.discard(path)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _install_cold(self, report_id: str, path: str) -> None:
+        """Make a spooled file the cold copy of a report; called with the lock held."""
+        self._spooling.discard(path)
+        self._drop_cold(report_id)
+        target = self._cold_path(report_id)
+        os.replace(path, target)
+        self._cold[report_id] = target
+
+    def open_cold_writer(self, report_id: str) -> "ColdWriter":
+        """Start writing a report's serialized JSON straight to the cold tier; see `commit_cold`."""
+        os.makedirs(self.cold_dir, exist_ok=True)
+        writer = ColdWriter(f"{self._cold_path(report_id)}.{os.urandom(4).hex()}.tmp")
+        with self._lock:
+            self._spooling.add(writer.path)
+        return writer
+
+    def commit_cold(self, report_id: str, writer: "ColdWriter") -> None:
+        """Store the report written by `writer` in place of any current one, without materializing it."""
+        writer.close()
+        with self._lock:
+            if report_id in self._hot:
+                del self._hot[report_id]
+                self._hot_bytes -= self._sizes.pop(report_id)
+            self._install_cold(report_id, writer.path)
+            self._bump_version(report_id)
+
+    def discard_cold_writer(self, writer: "ColdWriter") -> None:
+        writer.discard()
+        with self._lock:
+            self._spooling.discard(writer.path)
+
+    def _drop_cold(self, report_id: str) -> None:
+        path = self._cold.pop(report_id, None)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def compact(self) -> int:
+        """Remove cold-tier files no report refers to (e.g. left by an interrupted write). Returns bytes freed."""
+        freed = 0
+        with self._lock:
+            if not os.path.isdir(self.cold_dir):
+                return 0
+            live = set(self._cold.values()) | self._spooling
+            for name in os.listdir(self.cold_dir):
+                path = os.path.join(self.cold_dir, name)
+                if path not in live and (name.endswith(_COLD_SUFFIX) or name.endswith(".tmp")):
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        return freed
+
+    # --- Metrics ---
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        reads = self.hits + self.misses
+        return {
+            "memoryBudget": self.memory_budget,
+            "hotBytes": self._hot_bytes,
+            "hotReports": len(self._hot),
+            "coldReports": len(self._cold),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / reads if reads else None,
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations,
+            "rehydrationSecondsAvg": self.rehydration_seconds_total / self.rehydrations if self.rehydrations else None,
+            "rehydrationSecondsMax": self.rehydration_seconds_max,
+        }
@@ -0,0 +1,174 @@
+import base64
+import binascii
+import os
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from test_management_exposure.modules.test_result import ResultType, TestCase, TestGroup, TestStatus
+
+# Reports whose results index (and cached fragments) are kept in memory.
+RESULT_INDEX_MAX_REPORTS = int(os.environ.get("RESULT_INDEX_MAX_REPORTS", "64"))
+
+
+class StaleCursor(ValueError):
+    """Raised when a cursor is malformed or was issued for an earlier version of the report."""
+
+
+class _Node:
+    __slots__ = ("item", "_fragment")
+
+    def __init__(self, item: Union[TestCase, TestGroup]):
+        self.item = item
+        self._fragment: Optional[bytes] = None
+
+    @property
+    def fragment(self) -> bytes:
+        """JSON of the item as GET on the whole report renders it, serialized once."""
+        if self._fragment is None:
+            self._fragment = self.item.__pydantic_serializer__.to_json(self.item, by_alias=True, exclude_none=True)
+        return self._fragment
+
+
+class _ReportResults:
+    """Test case numbers to nodes for one version of a report, plus the
+    document-order list of test cases and cached filter matches over it.
+
+    Nodes of items that are the very same objects as in `previous` are
+    reused along with their serialized fragment.
+    """
+
+    def __init__(self, version: int, items, previous: Optional["_ReportResults"] = None):
+        # Cursors from versions since..version address the same list of cases
+        self.since = self.version = version
+        self.items = list(items or [])
+        self.by_number: Dict[str, _Node] = {}
+        self.cases: List[_Node] = []
+        self.nodes: List[_Node] = []
+        self._matches: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        self._reusable = {id(node.item): node for node in previous.nodes} if previous is not None else {}
+        self._add(self.items)
+        del self._reusable
+
+    def same_items(self, items) -> bool:
+        items = items or []
+        return len(items) == len(self.items) and all(a is b for a, b in zip(items, self.items))
+
+    def _add(self, items) -> None:
+        for item in items:
+            node = self._reusable.get(id(item))
+            if node is None or node.item is not item:
+                node = _Node(item)
+            self.nodes.append(node)
+            # The first of duplicated numbers is the addressable one
+            self.by_number.setdefault(item.number, node)
+            if isinstance(item, TestGroup):
+                self._add(item.groupItems)
+            else:
+                self.cases.append(node)
+
+    def matches(self, status: Optional[TestStatus], result: Optional[ResultType]) -> List[int]:
+        """Positions in `cases` of the test cases matching both filters."""
+        key = (status.value if status else None, result.value if result else None)
+        positions = self._matches.get(key)
+        if positions is None:
+            positions = [
+                i for i, node in enumerate(self.cases)
+                if (status is None or node.item.status == status) and (result is None or node.item.result == result)
+            ]
+            self._matches[key] = positions
+        return positions
+
+
+class ResultIndex:
+    """Per-report index of testResults, for serving test cases and groups on their own.
+
+    Each report gets a map of case/group numbers to nodes, resolved through
+    nested TestGroup.groupItems, and the document-order list of its test
+    cases. Nodes serialize their fragment once and keep it, so a request
+    costs in proportion to what it returns rather than to the whole report.
+    An index is rebuilt when the report's testResults change, reusing the
+    nodes of items kept from the previous version, and only the
+    RESULT_INDEX_MAX_REPORTS most recently used ones are kept.
+    """
+
+    def __init__(self, store, max_reports: int = RESULT_INDEX_MAX_REPORTS):
+        self._store = store
+        self.max_reports = max_reports
+        self._reports: "OrderedDict[str, _ReportResults]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    async def _get(self, report_id: str) -> _ReportResults:
+        version = self._store.version(report_id)
+        with self._lock:
+            results = self._reports.get(report_id)
+            if results is not None and results.version == version:
+                self._reports.move_to_end(report_id)
+                return results
+        # A cold report is rehydrated off the event loop
+        items = (await self._store.aget(report_id)).testResults
+        with self._lock:
+            previous = self._reports.get(report_id)
+        if previous is not None and previous.same_items(items):
+            # Only other members of the report changed
+            previous.version = version
+            results = previous
+        else:
+            results = _ReportResults(version, items, previous)
+            self.builds += 1
+        with self._lock:
+            self._reports[report_id] = results
+            self._reports.move_to_end(report_id)
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+        return results
+
+    async def fragment(self, report_id: str, number: str) -> Optional[bytes]:
+        """JSON of the test case or group `number`, or None when the report has none."""
+        node = (await self._get(report_id)).by_number.get(number)
+        return node.fragment if node is not None else None
+
+    async def page(
+        self,
+        report_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        status: Optional[TestStatus] = None,
+        result: Optional[ResultType] = None,
+    ) -> Tuple[List[bytes], int, Optional[str]]:
+        """Return (fragments, total matches, next cursor) for one page of test cases in document order."""
+        results = await self._get(report_id)
+        start = 0
+        if cursor:
+            version, position = _decode_cursor(cursor)
+            if not results.since <= version <= results.version:
+                raise StaleCursor("The report changed since this cursor was issued; restart from the first page.")
+            start = position
+        positions = results.matches(status, result)
+        first = bisect_left(positions, start)
+        selected = positions[first:first + limit]
+        next_cursor = None
+        if first + limit < len(positions):
+            next_cursor = _encode_cursor(results.version, positions[first + limit])
+        return [results.cases[i].fragment for i in selected], len(positions), next_cursor
+
+    def forget(self, report_id: str) -> None:
+        with self._lock:
+            self._reports.pop(report_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"reports": len(self._reports), "maxReports": self.max_reports, "builds": self.builds}
+
+
+def _encode_cursor(version: int, position: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{position}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        version, position = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        return int(version), int(position)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise StaleCursor("Malformed cursor.") from None
@@ -0,0 +1,268 @@
+import os
+import hashlib
+import struct
+import tarfile
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from test_management_exposure.modules.test_result import iter_test_cases
+
+# Directory holding one results archive per test report, and the largest upload accepted.
+ARCHIVE_DIR = os.environ.get("RESULTS_ARCHIVE_DIR", "./results_archives")
+ARCHIVE_MAX_BYTES = int(os.environ.get("RESULTS_ARCHIVE_MAX_BYTES", str(8 * 1024 ** 3)))
+CHUNK_SIZE = 1024 * 1024
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+class ArchiveError(Exception):
+    """Raised when an uploaded results archive cannot be stored or indexed."""
+
+
+@dataclass
+class ArchiveMember:
+    """Location of a single file inside a results archive."""
+    path: str
+    size: int
+    # Byte offset of the raw member data in the archive file, or None when the
+    # member is compressed and has to be decoded through zipfile/tarfile.
+    offset: Optional[int]
+    # Member name as stored in the archive, before normalization
+    name: str = ""
+
+
+@dataclass
+class ResultsArchive:
+    """A results archive on disk, indexed by member path without being extracted."""
+    file_path: str
+    format: str  # "zip" or "tar"
+    members: Dict[str, ArchiveMember]
+
+    def get(self, path: str) -> Optional[ArchiveMember]:
+        return self.members.get(normalize_member_path(path))
+
+    def missing(self, paths: List[str]) -> List[str]:
+        return [p for p in paths if self.get(p) is None]
+
+
+# Archives indexed so far, keyed by test report id
+archive_index: Dict[str, ResultsArchive] = {}
+
+
+def normalize_member_path(path: str) -> str:
+    path = path.replace("\\", "/")
+    while path.startswith("./"):
+        path = path[2:]
+    return path.lstrip("/")
+
+
+def archive_file_path(report_id: str) -> str:
+    # Report ids come from the URL: a hash keeps them inside ARCHIVE_DIR and distinct
+    return os.path.join(ARCHIVE_DIR, hashlib.sha256(report_id.encode()).hexdigest() + ".archive")
+
+
+def new_upload_path() -> str:
+    """A new, unique file in ARCHIVE_DIR for an upload in progress."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=ARCHIVE_DIR, suffix=".upload")
+    os.close(fd)
+    return path
+
+
+def _index_zip(file_path: str) -> Dict[str, ArchiveMember]:
+    members = {}
+    with open(file_path, "rb") as fh, zipfile.ZipFile(fh) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            offset = None
+            if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                # The central directory gives the local header offset; the data
+                # starts after the local header's variable-length name and extra.
+                fh.seek(info.header_offset)
+                header = _ZIP_LOCAL_HEADER.unpack(fh.read(_ZIP_LOCAL_HEADER.size))
+                offset = info.header_offset + _ZIP_LOCAL_HEADER.size + header[10] + header[11]
+            path = normalize_member_path(info.filename)
+            members[path] = ArchiveMember(path=path, size=info.file_size, offset=offset, name=info.filename)
+    return members
+
+
+def _index_tar(file_path: str) -> Dict[str, ArchiveMember]:
+    members = {}
+    # Only an uncompressed tar has member data at fixed offsets in the file
+    try:
+        tf = tarfile.open(file_path, "r:")
+        raw = True
+    except tarfile.ReadError:
+        tf = tarfile.open(file_path, "r:*")
+        raw = False
+    with tf:
+        for info in tf:
+            if not info.isfile():
+                continue
+            path = normalize_member_path(info.name)
+            members[path] = ArchiveMember(path=path, size=info.size, offset=info.offset_data if raw else None, name=info.name)
+    return members
+
+
+def index_archive(file_path: str) -> ResultsArchive:
+    """Build the member index for a zip or tar archive already written to disk."""
+    if zipfile.is_zipfile(file_path):
+        try:
+            return ResultsArchive(file_path=file_path, format="zip", members=_index_zip(file_path))
+        except zipfile.BadZipFile as exc:
+            raise ArchiveError(f"Invalid zip archive: {exc}") from exc
+    try:
+        return ResultsArchive(file_path=file_path, format="tar", members=_index_tar(file_path))
+    except tarfile.TarError as exc:
+        raise ArchiveError(f"Archive is neither a zip nor a tar file: {exc}") from exc
+
+
+def referenced_artifact_paths(report) -> List[str]:
+    """Collect every ArtifactsItem and ConfigurationArtifactsItem path referenced by a TestReport."""
+    paths = []
+    for test_case in iter_test_cases(report.testResults):
+        paths.extend(a.path for a in test_case.artifacts or [])
+    for component in report.testbedComponents or []:
+        paths.extend(a.path for a in component.configurationArtifacts or [])
+    return paths
+
+
+def discard_archive(report_id: str) -> None:
+    archive = archive_index.pop(report_id, None)
+    file_path = archive.file_path if archive else archive_file_path(report_id)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def prune_orphan_archives() -> int:
+    """Remove stored archives that no longer belong to an indexed report. Returns bytes freed."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return 0
+    live = {archive.file_path for archive in archive_index.values()}
+    freed = 0
+    for name in os.listdir(ARCHIVE_DIR):
+        path = os.path.join(ARCHIVE_DIR, name)
+        # In-progress uploads end in .upload and are left alone
+        if name.endswith(".archive") and path not in live:
+            freed += os.path.getsize(path)
+            os.remove(path)
+    return freed
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None when no range was requested and raises ValueError when the
+    range cannot be satisfied.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError("Only a single byte range is supported.")
+    start_s, _, end_s = spec.strip().partition("-")
+    if start_s == "":
+        # Suffix range: the last N bytes
+        length = int(end_s)
+        if length <= 0:
+            raise ValueError("Empty suffix range.")
+        start, end = max(size - length, 0), size - 1
+    else:
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+        end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable.")
+    return start, end
+
+
+class ArchiveMemberResponse(Response):
+    """Streams (part of) an archive member.
+
+    Stored members are sent straight from the archive file, through the ASGI
+    zero-copy send extension when the server offers it and read in chunks in
+    the threadpool otherwise. Compressed members are decoded on the fly, in
+    the threadpool too.
+    """
+
+    def __init__(self, archive: ResultsArchive, member: ArchiveMember, byte_range: Optional[Tuple[int, int]] = None):
+        self.archive = archive
+        self.member = member
+        start, end = byte_range if byte_range else (0, member.size - 1)
+        self.start, self.length = start, max(end - start + 1, 0)
+        headers = {
+            "accept-ranges": "bytes",
+            "content-length": str(self.length),
+        }
+        status_code = 200
+        if byte_range is not None:
+            status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{member.size}"
+        super().__init__(status_code=status_code, headers=headers, media_type="application/octet-stream")
+
+    async def __call__(self, scope, receive, send) -> None:
+        decoded = None
+        if self.member.offset is None and scope.get("method") != "HEAD" and self.length:
+            # Open before the headers go out, so that a failure is still an error response
+            decoded = await run_in_threadpool(self._open_decoded)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if decoded is None and (scope.get("method") == "HEAD" or self.length == 0):
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if decoded is None:
+            await self._send_stored(scope, send, self.member.offset + self.start)
+        else:
+            await self._send_decoded(send, *decoded)
+
+    async def _send_stored(self, scope, send, offset: int) -> None:
+        with open(self.archive.file_path, "rb") as fh:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fh, "offset": offset, "count": self.length, "more_body": False})
+                return
+            end = offset + self.length
+            while offset < end:
+                chunk = await run_in_threadpool(os.pread, fh.fileno(), min(CHUNK_SIZE, end - offset), offset)
+                if not chunk:
+                    # Archive truncated under us: end the body short rather than loop
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    return
+                offset += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": offset < end})
+
+    def _open_decoded(self):
+        """(container, stream) of the member, positioned at the range start."""
+        if self.archive.format == "zip":
+            container = zipfile.ZipFile(self.archive.file_path)
+            open_member = container.open
+        else:
+            container = tarfile.open(self.archive.file_path, "r:*")
+            open_member = container.extractfile
+        try:
+            stream = open_member(self.member.name or self.member.path)
+            # Compressed streams decode everything up to the start
+            stream.seek(self.start)
+        except BaseException:
+            container.close()
+            raise
+        return container, stream
+
+    async def _send_decoded(self, send, container, stream) -> None:
+        try:
+            remaining = self.length
+            while remaining > 0:
+                chunk = await run_in_threadpool(stream.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            stream.close()
+            container.close()
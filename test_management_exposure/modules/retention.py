@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from test_management_exposure.modules.test_metadata import TestType
+from test_management_exposure.modules.test_report import TestReport
+from test_management_exposure.modules.test_result import TestGroup, TestNotesItem
+
+# JSON list of RetentionPolicy objects, inline or in a file. No policy means nothing expires.
+RETENTION_POLICIES = os.environ.get("RETENTION_POLICIES", "")
+RETENTION_POLICY_FILE = os.environ.get("RETENTION_POLICY_FILE", "")
+# Seconds between retention passes.
+RETENTION_INTERVAL = float(os.environ.get("RETENTION_INTERVAL", "3600"))
+# A pass works in slices of this many milliseconds, pausing between them.
+RETENTION_SLICE_MS = float(os.environ.get("RETENTION_SLICE_MS", "5"))
+RETENTION_PAUSE_MS = float(os.environ.get("RETENTION_PAUSE_MS", "20"))
+
+STRIPPED_NOTE_TITLE = "Measurements compacted"
+
+
+class RetentionPolicy(BaseModel):
+    """How long reports matching testType/tags keep their data. The first matching policy applies."""
+    name: str = Field(..., description="Name of the policy, reported in the statistics.")
+    testType: Optional[List[TestType]] = Field(None, description="Test types the policy applies to; all when omitted.")
+    tags: Optional[List[str]] = Field(None, description="The policy applies to reports carrying any of these tags; all when omitted.")
+    stripMeasurementsAfterDays: Optional[float] = Field(None, ge=0, description="Age, from testMetadata.startDate, after which measurement arrays are reduced to summaries.")
+    deleteAfterDays: Optional[float] = Field(None, ge=0, description="Age, from testMetadata.startDate, after which the report is deleted.")
+
+    def matches(self, entry: "_CatalogEntry") -> bool:
+        if self.testType is not None and entry.testType not in self.testType:
+            return False
+        if self.tags is not None and not entry.tags.intersection(self.tags):
+            return False
+        return True
+
+
+def load_policies() -> List[RetentionPolicy]:
+    raw = RETENTION_POLICIES
+    if not raw and RETENTION_POLICY_FILE:
+        with open(RETENTION_POLICY_FILE) as fh:
+            raw = fh.read()
+    return [RetentionPolicy.model_validate(p) for p in json.loads(raw)] if raw else []
+
+
+def _numeric(values: list) -> bool:
+    return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+
+
+def _strip_case(case):
+    notes = []
+
+    def strip(measurement, metric_index, position):
+        if len(measurement.values) <= 1:
+            return measurement
+        values = measurement.values
+        numeric = _numeric(values)
+        summary = {"metric": metric_index, "position": position, "measurement": measurement.name, "count": len(values)}
+        if numeric:
+            summary.update(min=min(values), max=max(values), mean=sum(values) / len(values))
+        notes.append(TestNotesItem(title=STRIPPED_NOTE_TITLE, body=json.dumps(summary)))
+        return measurement.model_copy(update={"values": [summary["mean"] if numeric else values[-1]]})
+
+    metrics = [
+        m.model_copy(update={"measurements": [strip(x, index, position) for position, x in enumerate(m.measurements)]})
+        for index, m in enumerate(case.metrics)
+    ]
+    measurements = (
+        [strip(x, None, position) for position, x in enumerate(case.measurements)] if case.measurements else case.measurements
+    )
+    if not notes:
+        return case
+    return case.model_copy(update={"metrics": metrics, "measurements": measurements, "notes": [*(case.notes or []), *notes]})
+
+
+def compacted_measurements(case) -> Dict[Tuple[Optional[int], int], dict]:
+    """Summaries of the measurements of a test case that retention reduced to one value.
+
+    Keyed by (metric index, or None for test case measurements, position of
+    the measurement); each summary holds `count` and, for numeric arrays,
+    `min`, `max` and `mean` of the original values. A measurement that has
+    since been given more than one value again is not included.
+    """
+    found: Dict[Tuple[Optional[int], int], dict] = {}
+    for note in case.notes or []:
+        if note.title != STRIPPED_NOTE_TITLE:
+            continue
+        try:
+            summary = json.loads(note.body)
+            key = (summary["metric"], summary["position"])
+        except (ValueError, TypeError, KeyError):
+            # Notes written before summaries were recorded as JSON
+            continue
+        if not isinstance(key[1], int) or not (key[0] is None or isinstance(key[0], int)):
+            continue
+        found[key] = summary
+    for (metric, position), summary in list(found.items()):
+        if metric is None:
+            measurements = case.measurements or []
+        else:
+            measurements = case.metrics[metric].measurements if 0 <= metric < len(case.metrics) else []
+        measurement = measurements[position] if 0 <= position < len(measurements) else None
+        if measurement is None or len(measurement.values) != 1 or measurement.name != summary.get("measurement"):
+            del found[(metric, position)]
+    return found
+
+
+def _strip_items(items):
+    return [
+        item.model_copy(update={"groupItems": _strip_items(item.groupItems)}) if isinstance(item, TestGroup) else _strip_case(item)
+        for item in items
+    ]
+
+
+def strip_measurements(report: TestReport) -> TestReport:
+    """Copy of a report whose measurement arrays are reduced to one value each.
+
+    Numeric arrays keep their mean and other arrays their last value. The
+    count, and min/max/mean for numeric arrays, of every reduced array is
+    recorded as JSON in a note on its test case, read back by
+    `compacted_measurements`. Metadata, verdicts and metric results are
+    untouched.
+    """
+    if not report.testResults:
+        return report
+    return report.model_copy(update={"testResults": _strip_items(report.testResults)})
+
+
+class _CatalogEntry:
+    __slots__ = ("startDate", "testType", "tags", "stripped")
+
+    def __init__(self, report: TestReport):
+        start = report.testMetadata.startDate
+        self.startDate = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+        self.testType = report.testMetadata.testType
+        self.tags = set(report.tags or [])
+        self.stripped = False
+
+
+class RetentionScheduler:
+    """Applies retention policies to stored reports from a background asyncio task.
+
+    The scheduler keeps its own small catalog of startDate/testType/tags
+    per report so that a pass never has to load reports just to decide.
+    Each pass works in time slices of RETENTION_SLICE_MS and sleeps
+    RETENTION_PAUSE_MS between them, leaving the event loop to requests.
+    `strip` is a coroutine, expected to do the rewriting off the event loop,
+    that returns whether the report was stripped. Re-tracking a report (as
+    writes of new test results do) makes it eligible for stripping again.
+    """
+
+    def __init__(
+        self,
+        delete: Callable[[str], None],
+        strip: Callable[[str], Awaitable[bool]],
+        compact: Callable[[], int],
+        policies: Optional[List[RetentionPolicy]] = None,
+        interval: float = RETENTION_INTERVAL,
+    ):
+        self._delete = delete
+        self._strip = strip
+        self._compact = compact
+        self.policies = load_policies() if policies is None else policies
+        self.interval = interval
+        self._catalog: Dict[str, _CatalogEntry] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.passes = 0
+        self.deleted = 0
+        self.stripped = 0
+        self.compacted_bytes = 0
+        self.last_pass_seconds: Optional[float] = None
+
+    def track(self, report_id: str, report: TestReport) -> None:
+        self._catalog[report_id] = _CatalogEntry(report)
+
+    def untrack(self, report_id: str) -> None:
+        self._catalog.pop(report_id, None)
+
+    def policy_for(self, entry: _CatalogEntry) -> Optional[RetentionPolicy]:
+        for policy in self.policies:
+            if policy.matches(entry):
+                return policy
+        return None
+
+    def start(self) -> None:
+        if self._task is None and self.policies:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def trigger(self) -> None:
+        """Start the next pass now instead of waiting for the interval."""
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_pass()
+            except Exception as exc:  # keep the scheduler alive
+                print(f"Retention pass failed: {exc!r}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def run_pass(self) -> None:
+        started = time.perf_counter()
+        slice_started = started
+        now = datetime.now(timezone.utc)
+        for report_id in list(self._catalog):
+            entry = self._catalog.get(report_id)
+            policy = self.policy_for(entry) if entry is not None else None
+            if policy is not None:
+                age_days = (now - entry.startDate).total_seconds() / 86400
+                if policy.deleteAfterDays is not None and age_days >= policy.deleteAfterDays:
+                    self._delete(report_id)
+                    self.untrack(report_id)
+                    self.deleted += 1
+                elif policy.stripMeasurementsAfterDays is not None and age_days >= policy.stripMeasurementsAfterDays and not entry.stripped:
+                    if await self._strip(report_id):
+                        entry.stripped = True
+                        self.stripped += 1
+            if (time.perf_counter() - slice_started) * 1000 >= RETENTION_SLICE_MS:
+                await asyncio.sleep(RETENTION_PAUSE_MS / 1000)
+                slice_started = time.perf_counter()
+        self.compacted_bytes += self._compact()
+        self.passes += 1
+        self.last_pass_seconds = time.perf_counter() - started
+
+    def stats(self) -> Dict:
+        return {
+            "policies": [p.model_dump(exclude_none=True) for p in self.policies],
+            "running": self._task is not None,
+            "trackedReports": len(self._catalog),
+            "passes": self.passes,
+            "deleted": self.deleted,
+            "stripped": self.stripped,
+            "compactedBytes": self.compacted_bytes,
+            "lastPassSeconds": self.last_pass_seconds,
+        }
@@ -0,0 +1,213 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, see the `snapshot` extra
+    pa = None
+    pq = None
+
+from test_management_exposure.modules.report_store import serialize_report
+from test_management_exposure.modules.test_report import TestReport
+from test_management_exposure.modules.test_result import iter_test_cases
+
+# Reports per Parquet row group, which bounds the memory used in either direction.
+SNAPSHOT_REPORTS_PER_GROUP = int(os.environ.get("SNAPSHOT_REPORTS_PER_GROUP", "256"))
+# Measurement rows per Parquet row group.
+SNAPSHOT_MEASUREMENTS_PER_GROUP = int(os.environ.get("SNAPSHOT_MEASUREMENTS_PER_GROUP", "1000000"))
+# Largest snapshot upload accepted for a restore.
+SNAPSHOT_MAX_UPLOAD_BYTES = int(os.environ.get("SNAPSHOT_MAX_UPLOAD_BYTES", str(8 * 1024 ** 3)))
+
+REPORTS_FILE = "reports.parquet"
+MEASUREMENTS_FILE = "measurements.parquet"
+_CHUNK_SIZE = 1024 * 1024
+
+
+class SnapshotUnavailable(RuntimeError):
+    """Raised when pyarrow, needed for snapshots, is not installed."""
+
+
+class SnapshotError(ValueError):
+    """Raised when an uploaded snapshot cannot be read."""
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise SnapshotUnavailable("Snapshots need pyarrow: install the 'snapshot' extra.")
+
+
+def _reports_schema():
+    return pa.schema([
+        ("testId", pa.string()),
+        ("version", pa.int64()),
+        ("schemaVersion", pa.int64()),
+        ("startDate", pa.timestamp("us", tz="UTC")),
+        ("stopDate", pa.timestamp("us", tz="UTC")),
+        ("dutName", pa.string()),
+        ("testType", pa.string()),
+        ("result", pa.string()),
+        ("tags", pa.list_(pa.string())),
+        ("testCases", pa.int64()),
+        # Full report as JSON, validated again on restore
+        ("document", pa.large_string()),
+    ])
+
+
+def _measurements_schema():
+    return pa.schema([
+        ("testId", pa.string()),
+        ("testCase", pa.string()),
+        ("metric", pa.int32()),
+        ("measurement", pa.string()),
+        ("units", pa.string()),
+        ("valueIndex", pa.int32()),
+        ("value", pa.float64()),
+        ("valueText", pa.string()),
+    ])
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    # Naive datetimes are taken as UTC so that one column can hold every report
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _enum_value(value) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+class _Columns:
+    """Column-wise buffer for one row group."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+        self.rows = 0
+
+    def append(self, **row) -> None:
+        for name, column in self.columns.items():
+            column.append(row.get(name))
+        self.rows += 1
+
+    def flush(self, writer) -> None:
+        if self.rows:
+            writer.write_table(pa.Table.from_pydict(self.columns, schema=self.schema))
+            for column in self.columns.values():
+                column.clear()
+            self.rows = 0
+
+
+def _add_measurements(buffer: _Columns, test_id: str, report: TestReport) -> None:
+    for case in iter_test_cases(report.testResults):
+        groups = [(index, metric.measurements) for index, metric in enumerate(case.metrics)]
+        groups.append((None, case.measurements or []))
+        for metric_index, measurements in groups:
+            for measurement in measurements:
+                for value_index, value in enumerate(measurement.values):
+                    text = value if isinstance(value, str) else None
+                    buffer.append(
+                        testId=test_id, testCase=case.number, metric=metric_index,
+                        measurement=measurement.name, units=_enum_value(measurement.units),
+                        valueIndex=value_index, value=None if text is not None else float(value), valueText=text,
+                    )
+
+
+def write_snapshot(reports: Iterable[Tuple[str, int, TestReport]], directory: str) -> int:
+    """Write (testId, version, report) triples as reports.parquet and measurements.parquet.
+
+    Reports are consumed one at a time and written in row groups, so memory
+    use is bounded by the row group sizes, not the number of reports.
+    """
+    _require_pyarrow()
+    count = 0
+    reports_buffer = _Columns(_reports_schema())
+    measurements_buffer = _Columns(_measurements_schema())
+    with pq.ParquetWriter(os.path.join(directory, REPORTS_FILE), reports_buffer.schema, compression="zstd") as reports_writer, \
+            pq.ParquetWriter(os.path.join(directory, MEASUREMENTS_FILE), measurements_buffer.schema, compression="zstd") as measurements_writer:
+        for test_id, version, report in reports:
+            metadata = report.testMetadata
+            reports_buffer.append(
+                testId=test_id, version=version, schemaVersion=report.schemaVersion,
+                startDate=_utc(metadata.startDate), stopDate=_utc(metadata.stopDate),
+                dutName=metadata.dutName, testType=_enum_value(metadata.testType),
+                result=_enum_value(metadata.result), tags=report.tags,
+                testCases=sum(1 for _ in iter_test_cases(report.testResults)),
+                document=serialize_report(report).decode(),
+            )
+            _add_measurements(measurements_buffer, test_id, report)
+            count += 1
+            if reports_buffer.rows >= SNAPSHOT_REPORTS_PER_GROUP:
+                reports_buffer.flush(reports_writer)
+            if measurements_buffer.rows >= SNAPSHOT_MEASUREMENTS_PER_GROUP:
+                measurements_buffer.flush(measurements_writer)
+        reports_buffer.flush(reports_writer)
+        measurements_buffer.flush(measurements_writer)
+    return count
+
+
+def read_snapshot(path: str) -> Iterator[Tuple[str, TestReport, int]]:
+    """Yield (testId, report, serialized size) from a reports.parquet file, one row group batch at a time.
+
+    Every report is validated from its JSON document, and must carry the
+    testId of its row. Raises ValidationError for an invalid report and
+    SnapshotError for anything else unreadable.
+    """
+    _require_pyarrow()
+    try:
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=SNAPSHOT_REPORTS_PER_GROUP, columns=["testId", "document"]):
+            ids = batch.column("testId").to_pylist()
+            documents = batch.column("document")
+            for i, test_id in enumerate(ids):
+                data = documents[i].as_py()
+                if not isinstance(test_id, str) or not isinstance(data, str):
+                    raise SnapshotError(f"Row {i} of a batch has no testId or document.")
+                report = TestReport.model_validate_json(data)
+                if report.testMetadata.testId != test_id:
+                    raise SnapshotError(f"Row '{test_id}' holds the report of '{report.testMetadata.testId}'.")
+                yield test_id, report, len(data)
+    except (pa.ArrowException, OSError, KeyError) as exc:
+        raise SnapshotError(f"Invalid snapshot: {exc}") from exc
+
+
+def stream_tar(directory: str, names: List[str]) -> Iterator[bytes]:
+    """Stream files as an uncompressed tar archive, chunk by chunk, then remove `directory`."""
+    try:
+        for name in names:
+            path = os.path.join(directory, name)
+            info = tarfile.TarInfo(name)
+            info.size = os.path.getsize(path)
+            info.mtime = int(os.path.getmtime(path))
+            yield info.tobuf(format=tarfile.PAX_FORMAT)
+            with open(path, "rb") as fh:
+                while chunk := fh.read(_CHUNK_SIZE):
+                    yield chunk
+            if info.size % tarfile.BLOCKSIZE:
+                yield tarfile.NUL * (tarfile.BLOCKSIZE - info.size % tarfile.BLOCKSIZE)
+        yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def extract_reports_file(archive_path: str, directory: str) -> str:
+    """Extract reports.parquet from an uploaded snapshot tar and return its path."""
+    try:
+        with tarfile.open(archive_path, "r:*") as tf:
+            member = tf.getmember(REPORTS_FILE)
+            target = os.path.join(directory, REPORTS_FILE)
+            with tf.extractfile(member) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+            return target
+    except (tarfile.TarError, KeyError, EOFError, zlib.error) as exc:
+        raise SnapshotError(f"Snapshot must be a tar archive holding {REPORTS_FILE}: {exc}") from exc
+
+
+def make_spool_dir() -> str:
+    return tempfile.mkdtemp(prefix="snapshot-")
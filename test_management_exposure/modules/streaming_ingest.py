@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from test_management_exposure.modules.content_hash import ReportDigest, canonical_digest
+from test_management_exposure.modules.executor import parse_report, parse_specifications, parse_test_result_item
+from test_management_exposure.modules.report_store import ColdWriter, serialize_report
+from test_management_exposure.modules.test_report import TestReport
+
+# Largest PUT body accepted, in bytes.
+INGEST_MAX_BODY_BYTES = int(os.environ.get("INGEST_MAX_BODY_BYTES", str(512 * 1024 * 1024)))
+# PUT bodies from this size on, or without a Content-Length, are parsed as they arrive.
+INGEST_STREAM_MIN_BYTES = int(os.environ.get("INGEST_STREAM_MIN_BYTES", str(4 * 1024 * 1024)))
+
+# Structural characters, with and without the separators that only matter at the top level
+_TOP_TOKENS = re.compile(rb'[{}\[\]",:]')
+_INNER_TOKENS = re.compile(rb'[{}\[\]"]')
+# Rest of a string after its opening quote
+_STRING_REST = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+
+class IngestError(ValueError):
+    """Raised when a streamed body is not a JSON object of the expected shape."""
+
+
+class BodyTooLarge(Exception):
+    """Raised when a body exceeds INGEST_MAX_BODY_BYTES."""
+
+
+class ReportStreamScanner:
+    """Incremental scanner splitting a TestReport JSON body into pieces.
+
+    `feed` takes the body chunk by chunk and returns events:
+
+    - ("field", key, raw) for each top-level member other than testResults,
+    - ("results_start",), ("item", raw) for each testResults element and ("results_end",).
+
+    Only the structure is checked here; every raw piece is validated by
+    pydantic. Bytes are dropped as soon as the piece holding them has been
+    returned, so the buffer never holds more than one top-level value or
+    one testResults item.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+        self._depth = 0
+        # What comes next: "open", "key", "colon", "value", "comma" or "done" at the top
+        # level, "first", "item" or "separator" inside the testResults array
+        self._expect = "open"
+        self._key: Optional[str] = None
+        self._keys = set()
+        self._value_start: Optional[int] = None
+        self._in_results = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, data: bytes) -> List[Tuple]:
+        self._buf += data
+        events: List[Tuple] = []
+        self._scan(events)
+        keep = self._pos
+        for start in (self._value_start, self._item_start):
+            if start is not None:
+                keep = min(keep, start)
+        if keep:
+            del self._buf[:keep]
+            self._pos -= keep
+            if self._value_start is not None:
+                self._value_start -= keep
+            if self._item_start is not None:
+                self._item_start -= keep
+        return events
+
+    def close(self) -> None:
+        if self._expect != "done":
+            raise IngestError("Truncated JSON body.")
+
+    def _scan(self, events: List[Tuple]) -> None:
+        buf = self._buf
+        while True:
+            if self._expect == "done":
+                if buf[self._pos:].strip():
+                    raise IngestError("Unexpected data after the JSON object.")
+                self._pos = len(buf)
+                return
+            top = self._depth <= 1 or (self._in_results and self._depth == 2)
+            match = (_TOP_TOKENS if top else _INNER_TOKENS).search(buf, self._pos)
+            if match is None:
+                if top and self._expect != "value":
+                    self._check_blank(self._pos, len(buf))
+                self._pos = len(buf)
+                return
+            i = match.start()
+            char = buf[i:i + 1]
+            if char == b'"':
+                rest = _STRING_REST.match(buf, i + 1)
+                if rest is None:
+                    # Wait for the rest of the string
+                    self._pos = i
+                    return
+                if self._depth == 1 and self._expect == "key":
+                    self._check_blank(self._pos, i)
+                    self._key = json.loads(bytes(buf[i:rest.end()]))
+                    if self._key in self._keys:
+                        raise IngestError(f"Duplicate member '{self._key}'.")
+                    self._keys.add(self._key)
+                    self._expect = "colon"
+                elif self._in_results and self._depth == 2:
+                    raise IngestError("testResults items must be objects.")
+                elif self._depth == 1 and self._expect != "value":
+                    raise IngestError("Invalid JSON body.")
+                self._pos = rest.end()
+                continue
+            start, self._pos = self._pos, i + 1
+            if self._in_results and self._depth >= 2:
+                self._results_token(char, start, i, events)
+            elif self._depth == 0:
+                self._check_blank(start, i)
+                if char != b"{":
+                    raise IngestError("Body must be a JSON object.")
+                self._depth = 1
+                self._expect = "key"
+            elif self._depth == 1:
+                self._top_token(char, i, events)
+            elif char in b"{[":
+                self._depth += 1
+            elif char in b"}]":
+                self._depth -= 1
+
+    def _top_token(self, char: bytes, i: int, events: List[Tuple]) -> None:
+        if char == b":" and self._expect == "colon":
+            self._expect = "value"
+            self._value_start = i + 1
+        elif char in b"{[" and self._expect == "value":
+            if self._key == "testResults" and char == b"[" and not self._buf[self._value_start:i].strip():
+                self._value_start = None
+                self._in_results = True
+                self._expect = "first"
+                events.append(("results_start",))
+            self._depth += 1
+        elif char in b",}" and self._expect == "value":
+            raw = bytes(self._buf[self._value_start:i]).strip()
+            if not raw:
+                raise IngestError(f"Missing value for '{self._key}'.")
+            events.append(("field", self._key, raw))
+            self._value_start = None
+            self._end_member(char)
+        elif char in b",}" and self._expect == "comma":
+            self._end_member(char)
+        elif char == b"}" and self._expect == "key" and not self._keys:
+            self._depth = 0
+            self._expect = "done"
+        else:
+            raise IngestError(f"Unexpected '{char.decode()}' in the JSON object.")
+
+    def _end_member(self, char: bytes) -> None:
+        if char == b",":
+            self._expect = "key"
+        else:
+            self._depth = 0
+            self._expect = "done"
+
+    def _results_token(self, char: bytes, start: int, i: int, events: List[Tuple]) -> None:
+        if self._depth > 2:
+            if char in b"{[":
+                self._depth += 1
+            elif char in b"}]":
+                self._depth -= 1
+                if self._depth == 2:
+                    events.append(("item", bytes(self._buf[self._item_start:i + 1])))
+                    self._item_start = None
+                    self._expect = "separator"
+            return
+        # Between items of the testResults array
+        if self._buf[start:i].strip():
+            raise IngestError("testResults items must be objects.")
+        if char == b"{" and self._expect in ("first", "item"):
+            self._item_start = i
+            self._depth = 3
+        elif char == b"," and self._expect == "separator":
+            self._expect = "item"
+        elif char == b"]" and self._expect in ("first", "separator"):
+            self._in_results = False
+            self._depth = 1
+            self._expect = "comma"
+            events.append(("results_end",))
+        else:
+            raise IngestError("testResults items must be objects.")
+
+    def _check_blank(self, start: int, end: int) -> None:
+        if self._buf[start:end].strip():
+            raise IngestError("Invalid JSON body.")
+
+
+class IngestedReport:
+    """A report streamed into the store: its validated envelope (everything
+    but testResults), its content digest and, when the specifications arrived
+    before the test results, the evaluation of every test case."""
+
+    def __init__(self, envelope: TestReport, size: int, digest: ReportDigest, evaluations: Optional[Dict[str, Any]]):
+        self.envelope = envelope
+        self.size = size
+        self.digest = digest
+        self.evaluations = evaluations
+
+
+async def ingest_report(
+    chunks: AsyncIterator[bytes],
+    writer: ColdWriter,
+    run: Callable[..., Awaitable[Any]],
+    expectation_engine,
+    max_bytes: int = INGEST_MAX_BODY_BYTES,
+) -> IngestedReport:
+    """Validate a TestReport body as it arrives and write its compact JSON to `writer`.
+
+    Each testResults item is validated, written and evaluated on its own in
+    one `run` job (i.e. off the event loop when large), then dropped; the
+    other members are buffered and validated together at the end. Peak
+    memory therefore follows the largest test case, not the whole report.
+    """
+    scanner = ReportStreamScanner()
+    fields: Dict[str, bytes] = {}
+    specifications = None
+    evaluations: Optional[Dict[str, Any]] = {}
+    results = False
+    item_digests: List[bytes] = []
+    items = 0
+    received = 0
+    raw_hash = hashlib.sha256()
+
+    def take_item(raw: bytes, index: int, specifications) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+        item, compact, digest = parse_test_result_item(raw, index)
+        writer.write(b"," + compact if index else compact)
+        if specifications is None:
+            return digest, None
+        return digest, expectation_engine.evaluate_cases(specifications, [item])
+
+    def take_envelope(raw: bytes) -> TestReport:
+        envelope = parse_report(raw)
+        compact = serialize_report(envelope)
+        # The envelope is a JSON object with at least testMetadata, appended after testResults if present
+        writer.write(b"," + compact[1:] if results else compact)
+        return envelope
+
+    async for chunk in chunks:
+        received += len(chunk)
+        raw_hash.update(chunk)
+        if received > max_bytes:
+            raise BodyTooLarge(f"Body exceeds {max_bytes} bytes.")
+        for event in scanner.feed(chunk):
+            if event[0] == "item":
+                raw = event[1]
+                digest, evaluated = await run(len(raw), take_item, raw, items, specifications, allow_process=False)
+                item_digests.append(digest)
+                if evaluated is None:
+                    # Evaluated lazily once the whole report can be read back
+                    evaluations = None
+                elif evaluations is not None:
+                    evaluations.update(evaluated)
+                items += 1
+            elif event[0] == "field":
+                fields[event[1]] = event[2]
+                if event[1] == "testSpecifications":
+                    specifications = await run(len(event[2]), parse_specifications, event[2], allow_process=False)
+            elif event[0] == "results_start":
+                results = True
+                writer.write(b'{"testResults":[')
+            else:
+                writer.write(b"]")
+    scanner.close()
+
+    envelope_raw = b"{" + b",".join(json.dumps(key).encode() + b":" + raw for key, raw in fields.items()) + b"}"
+    envelope = await run(len(envelope_raw), take_envelope, envelope_raw, allow_process=False)
+    digest = ReportDigest(
+        {key: canonical_digest(json.loads(raw)) for key, raw in fields.items()},
+        item_digests if results else None,
+        raw_hash.hexdigest(),
+    )
+    return IngestedReport(envelope, writer.size, digest, evaluations)
@@ -0,0 +1,242 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, see the `snapshot` extra
+    pa = None
+    pq = None
+
+from test_management_exposure.modules.config_index import extract_fields, iter_configuration_parameters
+from test_management_exposure.modules.retention import compacted_measurements
+from test_management_exposure.modules.test_report import TestReport
+from test_management_exposure.modules.test_result import TestGroup
+
+# Rows per Parquet row group, which bounds the memory used by an export.
+EXPORT_ROWS_PER_GROUP = int(os.environ.get("EXPORT_ROWS_PER_GROUP", "65536"))
+# CSV output is sent in chunks of about this many bytes.
+EXPORT_CSV_CHUNK_BYTES = int(os.environ.get("EXPORT_CSV_CHUNK_BYTES", str(256 * 1024)))
+
+# ConfigurationParameters fields exported when the request names none
+DEFAULT_PARAMETERS = ["band5G", "frequencyRange5G", "duplexMode", "subCarrierSpacing", "totalTransmissionBandwidth", "numMimoLayers"]
+
+# (name, Parquet type factory); None marks the configuration parameter columns
+_COLUMNS: List[Tuple[str, Any]] = [
+    ("testId", lambda: pa.string()),
+    ("dutName", lambda: pa.string()),
+    ("testType", lambda: pa.string()),
+    ("startDate", lambda: pa.timestamp("us", tz="UTC")),
+    ("stopDate", lambda: pa.timestamp("us", tz="UTC")),
+    ("reportResult", lambda: pa.string()),
+    (None, None),
+    ("groupPath", lambda: pa.string()),
+    ("testCase", lambda: pa.string()),
+    ("testCaseName", lambda: pa.string()),
+    ("testCaseStatus", lambda: pa.string()),
+    ("testCaseResult", lambda: pa.string()),
+    ("metric", lambda: pa.int32()),
+    ("metricDescription", lambda: pa.string()),
+    ("metricStatus", lambda: pa.string()),
+    ("metricResult", lambda: pa.string()),
+    ("measurement", lambda: pa.string()),
+    ("units", lambda: pa.string()),
+    ("valueCount", lambda: pa.int64()),
+    ("valueMin", lambda: pa.float64()),
+    ("valueMax", lambda: pa.float64()),
+    ("valueMean", lambda: pa.float64()),
+    ("compacted", lambda: pa.bool_()),
+    ("values", lambda: pa.string()),
+]
+
+
+class ExportUnavailable(RuntimeError):
+    """Raised when a Parquet export is requested but pyarrow is not installed."""
+
+
+def parameter_fields(names: Iterable[str]) -> List[str]:
+    """Configuration parameter columns requested, deduplicated in order.
+
+    Raises ValueError for a name that is also a fixed column.
+    """
+    fixed = {name for name, _ in _COLUMNS if name is not None}
+    fields: List[str] = []
+    for name in names:
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name in fixed:
+            raise ValueError(f"Parameter '{name}' clashes with the '{name}' column.")
+        fields.append(name)
+    return fields
+
+
+def column_names(parameters: List[str]) -> List[str]:
+    names = []
+    for name, _ in _COLUMNS:
+        names.extend(parameters if name is None else [name])
+    return names
+
+
+def _enum_value(value) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def utc_datetime(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    # Naive datetimes are taken as UTC, as in snapshots
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _parameter_values(report: TestReport, parameters: List[str]) -> Dict[str, Optional[str]]:
+    """Distinct values of each wanted configuration parameter across the report, joined with ';'."""
+    wanted = set(parameters)
+    found: Dict[str, List[str]] = {}
+    for params in iter_configuration_parameters(report):
+        for field, value in extract_fields(params):
+            if field in wanted:
+                text = str(_enum_value(value)).lower() if isinstance(value, bool) else str(_enum_value(value))
+                values = found.setdefault(field, [])
+                if text not in values:
+                    values.append(text)
+    return {name: ";".join(found[name]) if name in found else None for name in parameters}
+
+
+def _summary(values: list) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    if not numbers:
+        return None, None, None
+    return float(min(numbers)), float(max(numbers)), sum(numbers) / len(numbers)
+
+
+def _iter_cases(items, path: Tuple[str, ...] = ()) -> Iterator[Tuple[str, Any]]:
+    for item in items or []:
+        if isinstance(item, TestGroup):
+            yield from _iter_cases(item.groupItems, path + (item.number,))
+        else:
+            yield "/".join(path), item
+
+
+def iter_rows(
+    reports: Iterable[Tuple[str, TestReport]], parameters: List[str], include_values: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """One row per TestCase x MetricsItem x MeasurementsItem, plus one per test case measurement.
+
+    Test case measurements, outside any metric, have an empty `metric`.
+    `values` holds the JSON array of values only with `include_values`.
+    Measurements reduced by retention are `compacted`: their count/min/max/mean
+    are those of the original values, while `values` holds what is left.
+    """
+    for test_id, report in reports:
+        metadata = report.testMetadata
+        base = {
+            "testId": test_id, "dutName": metadata.dutName, "testType": _enum_value(metadata.testType),
+            "startDate": utc_datetime(metadata.startDate), "stopDate": utc_datetime(metadata.stopDate),
+            "reportResult": _enum_value(metadata.result), **_parameter_values(report, parameters),
+        }
+        for group_path, case in _iter_cases(report.testResults):
+            case_columns = {
+                **base, "groupPath": group_path, "testCase": case.number, "testCaseName": case.name,
+                "testCaseStatus": _enum_value(case.status), "testCaseResult": _enum_value(case.result),
+            }
+            compacted = compacted_measurements(case)
+            groups = [(index, metric) for index, metric in enumerate(case.metrics)]
+            groups.append((None, None))
+            for index, metric in groups:
+                measurements = metric.measurements if metric is not None else case.measurements or []
+                for position, measurement in enumerate(measurements):
+                    summary = compacted.get((index, position))
+                    if summary is None:
+                        count = len(measurement.values)
+                        low, high, mean = _summary(measurement.values)
+                    else:
+                        count, low, high, mean = summary["count"], summary.get("min"), summary.get("max"), summary.get("mean")
+                    yield {
+                        **case_columns,
+                        "metric": index,
+                        "metricDescription": metric.description if metric is not None else None,
+                        "metricStatus": _enum_value(metric.status) if metric is not None else None,
+                        "metricResult": _enum_value(metric.result) if metric is not None else None,
+                        "measurement": measurement.name, "units": _enum_value(measurement.units),
+                        "valueCount": count, "valueMin": low, "valueMax": high, "valueMean": mean,
+                        "compacted": summary is not None,
+                        "values": json.dumps(measurement.values) if include_values else None,
+                    }
+
+
+def stream_csv(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    """Write rows as CSV, yielding chunks of about EXPORT_CSV_CHUNK_BYTES."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(
+            row[name].isoformat() if isinstance(row[name], datetime) else row[name]
+            for name in columns
+        )
+        if buffer.tell() >= EXPORT_CSV_CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file collecting what pyarrow writes until it is taken."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_parquet(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    """Write rows as a Parquet file, yielding each row group as soon as it is written.
+
+    Raises ExportUnavailable right away, rather than on iteration, without pyarrow.
+    """
+    if pa is None:
+        raise ExportUnavailable("Parquet exports need pyarrow: install the 'snapshot' extra.")
+    return _parquet_chunks(rows, columns)
+
+
+def _parquet_chunks(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    types = dict((name, factory) for name, factory in _COLUMNS if name is not None)
+    schema = pa.schema([(name, types[name]() if name in types else pa.string()) for name in columns])
+    buffer: Dict[str, List[Any]] = {name: [] for name in columns}
+    count = 0
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for row in rows:
+            for name, column in buffer.items():
+                column.append(row[name])
+            count += 1
+            if count >= EXPORT_ROWS_PER_GROUP:
+                writer.write_table(pa.Table.from_pydict(buffer, schema=schema))
+                for column in buffer.values():
+                    column.clear()
+                count = 0
+                yield sink.take()
+        if count:
+            writer.write_table(pa.Table.from_pydict(buffer, schema=schema))
+    yield sink.take()
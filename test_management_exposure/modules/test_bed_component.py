@@ -1,6 +1,6 @@
 from typing import List, Optional
 from pydantic import BaseModel, Field, EmailStr
-from modules.configuration import ConfigurationParameters
+from test_management_exposure.modules.configuration import ConfigurationParameters
 
 class ContactsItem(BaseModel):
     """Contact information for person / party involved in the testing or an aspect of the testing."""
@@ -2,7 +2,7 @@ from typing import List, Optional, Union
 from datetime import datetime
 from enum import Enum
 from pydantic import BaseModel, Field, EmailStr, HttpUrl
-from modules.configuration import ConfigurationParameters
+from test_management_exposure.modules.configuration import ConfigurationParameters
 
 class ContactsItem(BaseModel):
     """Contact information for person / party involved in the testing or an aspect of the testing."""
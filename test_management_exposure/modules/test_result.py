@@ -139,3 +139,12 @@ class TestGroup(BaseModel):
         extra = "forbid"
 
 
+
+
+def iter_test_cases(items):
+    """Yield every TestCase in a testResults list, descending through TestGroup.groupItems."""
+    for item in items or []:
+        if isinstance(item, TestGroup):
+            yield from iter_test_cases(item.groupItems)
+        else:
+            yield item
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+# Window in milliseconds during which PATCHes to the same report are merged; 0 disables coalescing.
+PATCH_COALESCE_WINDOW_MS = float(os.environ.get("PATCH_COALESCE_WINDOW_MS", "0"))
+# A burst is applied early once it holds this many PATCHes.
+PATCH_COALESCE_MAX_OPS = int(os.environ.get("PATCH_COALESCE_MAX_OPS", "64"))
+
+
+class _Burst:
+    def __init__(self):
+        self.ops: List[Any] = []
+        self.waiters: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class WriteCoalescer:
+    """Buffers writes per report id and applies each burst as one update.
+
+    `apply(report_id, ops)` receives the buffered operations in arrival
+    order, performs the merged update and returns the resulting report
+    version, which every caller of the burst is acknowledged with. An
+    exception raised by `apply` is raised to every caller of the burst.
+
+    Readers call `flush` first so they always see their own writes.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[str, List[Any]], int],
+        window_ms: float = PATCH_COALESCE_WINDOW_MS,
+        max_ops: int = PATCH_COALESCE_MAX_OPS,
+    ):
+        self._apply = apply
+        self.window = window_ms / 1000
+        self.max_ops = max_ops
+        self._pending: Dict[str, _Burst] = {}
+        self.bursts = 0
+        self.ops = 0
+        self.largest_burst = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, report_id: str, op: Any) -> int:
+        if not self.enabled:
+            return self._run(report_id, [op])
+        burst = self._pending.get(report_id)
+        if burst is None:
+            burst = self._pending[report_id] = _Burst()
+            burst.timer = asyncio.get_running_loop().call_later(self.window, self.flush, report_id)
+        waiter = asyncio.get_running_loop().create_future()
+        burst.ops.append(op)
+        burst.waiters.append(waiter)
+        if len(burst.ops) >= self.max_ops:
+            self.flush(report_id)
+        return await waiter
+
+    def flush(self, report_id: str) -> None:
+        """Apply the pending burst of a report now, if there is one."""
+        burst = self._pending.pop(report_id, None)
+        if burst is None:
+            return
+        burst.timer.cancel()
+        try:
+            version = self._run(report_id, burst.ops)
+        except Exception as exc:
+            for waiter in burst.waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            return
+        for waiter in burst.waiters:
+            if not waiter.done():
+                waiter.set_result(version)
+
+    def flush_all(self) -> None:
+        for report_id in list(self._pending):
+            self.flush(report_id)
+
+    def _run(self, report_id: str, ops: List[Any]) -> int:
+        self.bursts += 1
+        self.ops += len(ops)
+        self.largest_burst = max(self.largest_burst, len(ops))
+        return self._apply(report_id, ops)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "windowMs": self.window * 1000,
+            "maxOps": self.max_ops,
+            "pendingReports": len(self._pending),
+            "bursts": self.bursts,
+            "ops": self.ops,
+            "opsPerBurst": self.ops / self.bursts if self.bursts else None,
+            "largestBurst": self.largest_burst,
+        }
@@ -0,0 +1,62 @@
+import asyncio
+import gzip
+import tracemalloc
+
+from test_management_exposure.modules.compression import RequestDecompression
+
+MAX_BYTES = 1024 * 1024
+
+
+async def read_body(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(len(body)).encode()})
+
+
+def post(chunks, max_bytes=MAX_BYTES):
+    """Status and body of a gzip POST sent as `chunks` through RequestDecompression."""
+    app = RequestDecompression(read_body, max_bytes=max_bytes)
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [(b"content-encoding", b"gzip")]}
+    messages = [{"type": "http.request", "body": c, "more_body": i < len(chunks) - 1} for i, c in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_small_body_is_inflated():
+    assert post([gzip.compress(b"x" * 1000)]) == (200, b"1000")
+
+
+def test_body_at_the_limit_is_accepted():
+    data = gzip.compress(b"x" * MAX_BYTES)
+    assert post([data[:100], data[100:]]) == (200, str(MAX_BYTES).encode())
+
+
+def test_bomb_in_a_single_chunk_is_rejected_without_inflating_it():
+    bomb = gzip.compress(bytes(256 * 1024 * 1024), 9)
+    tracemalloc.start()
+    try:
+        status, _ = post([bomb])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert status == 413
+    assert peak < 16 * MAX_BYTES
+
+
+def test_bomb_in_many_chunks_is_rejected():
+    bomb = gzip.compress(bytes(64 * 1024 * 1024), 9)
+    chunks = [bomb[i:i + 4096] for i in range(0, len(bomb), 4096)]
+    assert post(chunks)[0] == 413
@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+import pathlib
+
+from fastapi.testclient import TestClient
+
+import api_server
+
+BASE = "/ProvMnS/v1alpha1/SubNetwork"
+EXAMPLES = pathlib.Path(__file__).resolve().parent.parent / "examples"
+
+
+def make_report(test_id: str, dut_name: str) -> dict:
+    report = json.loads((EXAMPLES / "put.json").read_text())
+    report["testMetadata"]["testId"] = test_id
+    report["testMetadata"]["dutName"] = dut_name
+    report["testResults"] = json.loads((EXAMPLES / "patch.json").read_text())["testResults"]
+    return report
+
+
+def test_export_decodes_only_reports_matching_metadata(monkeypatch):
+    client = TestClient(api_server.app)
+    for test_id, dut_name in [("export-a", "dut-a"), ("export-b", "dut-b"), ("export-c", "dut-a")]:
+        assert client.put(f"{BASE}/{test_id}", content=json.dumps(make_report(test_id, dut_name))).status_code in (200, 201)
+
+    decoded = []
+    peek = api_server.test_report_db.peek
+
+    def recording_peek(report_id):
+        decoded.append(report_id)
+        return peek(report_id)
+
+    monkeypatch.setattr(api_server.test_report_db, "peek", recording_peek)
+    response = client.get(f"{BASE}/exports/measurements", params={"dutName": "dut-a"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert {row["testId"] for row in rows} >= {"export-a", "export-c"}
+    assert {row["dutName"] for row in rows} == {"dut-a"}
+    assert "export-b" not in decoded
+
+    monkeypatch.undo()
+    for test_id in ("export-a", "export-b", "export-c"):
+        assert client.delete(f"{BASE}/{test_id}").status_code == 204
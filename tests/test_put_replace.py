@@ -0,0 +1,67 @@
+import copy
+import json
+import pathlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+from test_management_exposure.modules.executor import parse_report, parse_test_results
+
+BASE = "/ProvMnS/v1alpha1/SubNetwork"
+EXAMPLES = pathlib.Path(__file__).resolve().parent.parent / "examples"
+
+
+def make_report(test_id: str, values: list) -> dict:
+    report = json.loads((EXAMPLES / "put.json").read_text())
+    case = json.loads((EXAMPLES / "patch.json").read_text())["testResults"][0]
+    report["testMetadata"]["testId"] = test_id
+    report["testResults"] = [dict(copy.deepcopy(case), number=str(i)) for i in range(1, 4)]
+    report["testResults"][0]["metrics"][0]["measurements"][0]["values"] = values
+    return report
+
+
+def first_values(report: dict) -> list:
+    return report["testResults"][0]["metrics"][0]["measurements"][0]["values"]
+
+
+def test_patch_while_put_is_parsed_does_not_leak_into_replacement(monkeypatch):
+    client = TestClient(api_server.app)
+    v1 = make_report("race-put", [1.0, 2.0])
+    assert client.put(f"{BASE}/race-put", content=json.dumps(v1)).status_code == 201
+
+    # v2 keeps item 0 of v1, so it would be spliced from the stored report
+    v2 = copy.deepcopy(v1)
+    v2["testResults"][2]["result"] = "FAIL"
+    patched = copy.deepcopy(v1["testResults"])
+    first_values({"testResults": patched})[:] = [9.0]
+
+    def parse_after_patch(raw: bytes):
+        # A PATCH lands between the digest step and the store step of the PUT
+        api_server.apply_test_results_patches("race-put", [parse_test_results(patched)])
+        return parse_report(raw)
+
+    monkeypatch.setattr(api_server, "parse_report", parse_after_patch)
+    assert client.put(f"{BASE}/race-put", content=json.dumps(v2)).status_code == 200
+    monkeypatch.undo()
+
+    stored = client.get(f"{BASE}/race-put").json()
+    assert first_values(stored) == [1.0, 2.0]
+    assert [case["result"] for case in stored["testResults"]] == [case["result"] for case in v2["testResults"]]
+    # The digest recorded for the report matches what is stored
+    assert client.put(f"{BASE}/race-put", content=json.dumps(v2)).status_code == 204
+    assert first_values(client.get(f"{BASE}/race-put").json()) == [1.0, 2.0]
+
+    assert client.delete(f"{BASE}/race-put").status_code == 204
+
+
+@pytest.mark.parametrize("values", [[3.0], [4.0, 5.0]])
+def test_replace_keeps_unchanged_items(values):
+    client = TestClient(api_server.app)
+    v1 = make_report("replace", [1.0])
+    assert client.put(f"{BASE}/replace", content=json.dumps(v1)).status_code in (200, 201)
+    v2 = copy.deepcopy(v1)
+    first_values(v2)[:] = values
+    assert client.put(f"{BASE}/replace", content=json.dumps(v2)).status_code == 200
+    assert first_values(client.get(f"{BASE}/replace").json()) == values
+    assert client.put(f"{BASE}/replace", content=json.dumps(v2)).status_code == 204
@@ -0,0 +1,60 @@
+import copy
+import json
+import pathlib
+
+from test_management_exposure.modules.expectation_eval import ExpectationEngine
+from test_management_exposure.modules.executor import parse_report
+from test_management_exposure.modules.retention import compacted_measurements, strip_measurements
+from test_management_exposure.modules.tabular_export import iter_rows
+from test_management_exposure.modules.test_result import ResultType, iter_test_cases
+
+EXAMPLES = pathlib.Path(__file__).resolve().parent.parent / "examples"
+
+
+def make_report(values: list):
+    report = json.loads((EXAMPLES / "put.json").read_text())
+    report["testResults"] = copy.deepcopy(json.loads((EXAMPLES / "patch.json").read_text())["testResults"])
+    report["testResults"][0]["metrics"][0]["measurements"][0]["values"] = values
+    # A target in the units of the measurement, met by the mean but not by every value
+    report["testSpecifications"][0]["expectationTargets"] = [{
+        "targetName": "PEE.AvgPower", "targetCondition": "IS_GREATER_THAN_OR_EQUAL_TO",
+        "targetValueRange": [20], "targetUnit": "W",
+    }]
+    return parse_report(json.dumps(report).encode())
+
+
+def test_strip_keeps_summary_of_original_values():
+    stripped = strip_measurements(make_report([10, 30, 50]))
+    case = next(iter_test_cases(stripped.testResults))
+    assert case.metrics[0].measurements[0].values == [30.0]
+    assert compacted_measurements(case) == {
+        (0, 0): {"metric": 0, "position": 0, "measurement": "PEE.AvgPower", "count": 3, "min": 10, "max": 50, "mean": 30.0},
+    }
+
+
+def test_export_reports_original_summary_of_stripped_measurements():
+    rows = list(iter_rows([("r", strip_measurements(make_report([10, 30, 50])))], []))
+    row = next(r for r in rows if r["measurement"] == "PEE.AvgPower")
+    assert (row["valueCount"], row["valueMin"], row["valueMax"], row["valueMean"]) == (3, 10, 50, 30.0)
+    assert row["compacted"] is True
+    assert not any(r["compacted"] for r in rows if r is not row)
+
+
+def test_evaluation_skips_stripped_measurements():
+    engine = ExpectationEngine(lambda report_id: 1)
+    report = make_report([10, 30, 50])
+    assert engine.result("r", report, 1).result == ResultType.FAIL
+
+    evaluation = engine.result("r", strip_measurements(report), 2)
+    [power] = [m for m in evaluation.measurements if m.measurement == "PEE.AvgPower"]
+    assert power.result == ResultType.SKIP
+    assert "compacted" in power.detail
+
+
+def test_summary_dropped_once_values_are_replaced():
+    stripped = strip_measurements(make_report([10, 30, 50]))
+    case = next(iter_test_cases(stripped.testResults))
+    metric = case.metrics[0].model_copy(update={"measurements": [
+        case.metrics[0].measurements[0].model_copy(update={"values": [1, 2]}), *case.metrics[0].measurements[1:],
+    ]})
+    assert compacted_measurements(case.model_copy(update={"metrics": [metric, *case.metrics[1:]]})) == {}